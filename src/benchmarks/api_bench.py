@@ -0,0 +1,229 @@
+"""
+In-process load test for the Locker System API.
+
+Drives main.app through httpx's ASGI transport (no network, no server)
+against a throwaway SQLite database, with a weighted mix of realistic calls,
+and reports throughput and p50/p95/p99 latency per route.
+
+Run from src/:
+    python -m benchmarks.api_bench --requests 5000 --concurrency 32
+    python -m benchmarks.api_bench --save-baseline baseline.json
+    python -m benchmarks.api_bench --baseline baseline.json --max-regression 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+# (name, weight) of each scenario in the mix
+DEFAULT_MIX = {
+    "login": 10,
+    "create_transaction": 15,
+    "validate": 25,
+    "open_locker": 25,
+    "check_transaction": 15,
+    "log_burst": 10,
+}
+LOG_BURST_SIZE = 100
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+class Bench:
+    def __init__(self, client, rng, lockers, orgs):
+        self.client = client
+        self.rng = rng
+        self.lockers = lockers
+        self.orgs = orgs
+        self.transactions = []
+        self.next_window = 0
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def _call(self, route, method, url, **kwargs):
+        start = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.latencies[route].append(time.perf_counter() - start)
+        if response.status_code >= 400 or "error" in response.text[:20]:
+            self.errors[route] += 1
+        return response
+
+    async def login(self):
+        username = self.rng.choice(self.orgs)
+        await self._call("POST /auth/login", "POST", "/auth/login", params={"username": username, "password": "pw"})
+
+    async def create_transaction(self):
+        # Windows never overlap, so bookings don't conflict
+        start = 2_000_000_000 + self.next_window * 10
+        self.next_window += 1
+        response = await self._call("POST /transactions/", "POST", "/transactions/", json={
+            "borrower": self.rng.randint(1, 1000),
+            "lender": self.rng.randint(1, 50),
+            "start_date": start,
+            "end_date": start + 5,
+            "state": 1,
+            "locker_id": self.rng.choice(self.lockers),
+        })
+        if response.status_code == 200:
+            self.transactions.append(response.json()["id"])
+
+    async def validate(self):
+        if self.transactions:
+            transaction_id = self.rng.choice(self.transactions)
+            await self._call("GET /transactions/{id}/validate", "GET", f"/transactions/{transaction_id}/validate")
+
+    async def check_transaction(self):
+        if self.transactions:
+            transaction_id = self.rng.choice(self.transactions)
+            await self._call("GET /locker_website/check_transaction/{id}", "GET",
+                             f"/locker_website/check_transaction/{transaction_id}")
+
+    async def open_locker(self):
+        locker_id = self.rng.choice(self.lockers)
+        await self._call("POST /locker_manager/open_locker/{id}", "POST", f"/locker_manager/open_locker/{locker_id}")
+
+    async def log_burst(self):
+        now = int(time.time())
+        logs = [{
+            "action": self.rng.randint(0, 1),
+            "person": self.rng.randint(1, 1000),
+            "time": now + i,
+            "transaction_id": self.rng.choice(self.transactions) if self.transactions else None,
+        } for i in range(LOG_BURST_SIZE)]
+        await self._call("POST /logs/batch", "POST", "/logs/batch", json={"logs": logs})
+
+async def _setup(client, lockers, orgs):
+    locker_ids = []
+    for _ in range(lockers):
+        locker_ids.append((await client.post("/lockers/", json={"state": 0})).json()["id"])
+    usernames = []
+    for i in range(orgs):
+        username = f"bench-org-{i}"
+        await client.post("/organizations/", json={"username": username, "password": "pw"})
+        usernames.append(username)
+    return locker_ids, usernames
+
+async def run(args):
+    import httpx
+    import main
+    from bootstrap import create_schema_async
+
+    await create_schema_async()
+
+    rng = random.Random(args.seed)
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            lockers, orgs = await _setup(client, args.lockers, args.orgs)
+            bench = Bench(client, rng, lockers, orgs)
+            for _ in range(args.warmup):
+                await bench.create_transaction()
+            bench.latencies.clear()
+            bench.errors.clear()
+
+            names = list(DEFAULT_MIX)
+            weights = [DEFAULT_MIX[name] for name in names]
+            plan = rng.choices(names, weights, k=args.requests)
+            queue = asyncio.Queue()
+            for name in plan:
+                queue.put_nowait(name)
+
+            async def worker():
+                while not queue.empty():
+                    await getattr(bench, queue.get_nowait())()
+
+            started = time.perf_counter()
+            await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+            elapsed = time.perf_counter() - started
+    return summarize(bench, elapsed)
+
+def summarize(bench, elapsed):
+    routes = {}
+    total = 0
+    for route, values in sorted(bench.latencies.items()):
+        values.sort()
+        total += len(values)
+        routes[route] = {
+            "count": len(values),
+            "errors": bench.errors[route],
+            "p50_ms": percentile(values, 0.50) * 1000,
+            "p95_ms": percentile(values, 0.95) * 1000,
+            "p99_ms": percentile(values, 0.99) * 1000,
+        }
+    return {"elapsed_s": elapsed, "requests": total, "throughput_rps": total / elapsed if elapsed else 0.0, "routes": routes}
+
+def print_report(result, baseline=None):
+    print(f"{result['requests']} requests in {result['elapsed_s']:.2f}s: {result['throughput_rps']:.1f} req/s")
+    header = f"{'route':45} {'count':>7} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for route, stats in result["routes"].items():
+        line = (f"{route:45} {stats['count']:7d} {stats['errors']:5d} "
+                f"{stats['p50_ms']:9.2f} {stats['p95_ms']:9.2f} {stats['p99_ms']:9.2f}")
+        base = baseline["routes"].get(route) if baseline else None
+        if base and base["p95_ms"]:
+            line += f"   p95 {(stats['p95_ms'] / base['p95_ms'] - 1) * 100:+.1f}%"
+        print(line)
+
+def regressions(result, baseline, max_regression):
+    """
+    Return descriptions of every metric that got worse than the baseline by
+    more than `max_regression` (a fraction).
+    """
+    found = []
+    if baseline["throughput_rps"] and result["throughput_rps"] < baseline["throughput_rps"] * (1 - max_regression):
+        found.append(f"throughput {baseline['throughput_rps']:.1f} -> {result['throughput_rps']:.1f} req/s")
+    for route, stats in result["routes"].items():
+        base = baseline["routes"].get(route)
+        if not base:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if base[metric] and stats[metric] > base[metric] * (1 + max_regression):
+                found.append(f"{route} {metric} {base[metric]:.2f} -> {stats[metric]:.2f}")
+    return found
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--lockers", type=int, default=200)
+    parser.add_argument("--orgs", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=200, help="transactions created before measuring")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--save-baseline", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--max-regression", type=float, default=0.2,
+                        help="fail when a metric is worse than the baseline by more than this fraction")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Must be set before config is imported
+        os.environ["LOCKER_DATABASE_URL"] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        result = asyncio.run(run(args))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(result, f, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+    if baseline:
+        found = regressions(result, baseline, args.max_regression)
+        for line in found:
+            print("REGRESSION:", line)
+        return 1 if found else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
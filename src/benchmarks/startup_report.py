@@ -0,0 +1,70 @@
+"""
+Import-cost report for API cold start.
+
+Imports a module (main by default) in a fresh interpreter with
+`python -X importtime` and reports the wall time plus the most expensive
+modules, both by cumulative and self time, and the self time summed per
+top-level package.
+
+Run from src/:
+    python -m benchmarks.startup_report
+    python -m benchmarks.startup_report --module main --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+def measure(module: str):
+    """
+    Return (wall seconds, [(module, self_us, cumulative_us, depth)]) for
+    importing `module` in a fresh interpreter.
+    """
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, cwd=os.getcwd(),
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return wall, rows
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    wall, rows = measure(args.module)
+    total_us = sum(row[1] for row in rows)
+    print(f"import {args.module}: {wall * 1000:.0f} ms wall (interpreter start included), "
+          f"{total_us / 1000:.0f} ms in imports, {len(rows)} modules")
+
+    print(f"\nTop {args.top} by cumulative time")
+    for name, _, cumulative_us, depth in sorted(rows, key=lambda row: -row[2])[:args.top]:
+        print(f"  {cumulative_us / 1000:9.1f} ms  {'  ' * min(depth, 6)}{name}")
+
+    print(f"\nTop {args.top} by self time")
+    for name, self_us, _, _ in sorted(rows, key=lambda row: -row[1])[:args.top]:
+        print(f"  {self_us / 1000:9.1f} ms  {name}")
+
+    per_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        per_package[name.split(".")[0]] += self_us
+    print(f"\nTop {args.top} packages by total self time")
+    for package, self_us in sorted(per_package.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {self_us / 1000:9.1f} ms  {package}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,18 @@
+# bootstrap.py
+# Creates the database schema. Run once per deployment, before starting the API:
+#     python bootstrap.py
+# create_all only adds missing tables (with their indexes); it does not alter
+# existing ones.
+import models  # noqa: F401  (registers the tables on Base)
+from database import Base, async_engine, engine
+
+def create_schema(bind=engine):
+    Base.metadata.create_all(bind=bind)
+
+async def create_schema_async(bind=async_engine):
+    async with bind.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+if __name__ == "__main__":
+    create_schema()
+    print(f"Schema created on {engine.url.render_as_string(hide_password=True)}")
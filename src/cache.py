@@ -0,0 +1,102 @@
+# cache.py
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    """
+    Bounded in-process LRU cache whose entries also expire after `ttl` seconds.
+    Not thread-safe: it is meant to be used from the app's event loop.
+
+    Read-through callers that await the source between a miss and storing the
+    result use begin_fill()/fill(): a set() or invalidate() of the key in the
+    meantime bumps its generation and the (possibly stale) fill is dropped.
+    """
+    _MISSING = object()
+
+    def __init__(self, maxsize: int, ttl: float, timer=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._timer = timer
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._fills = {}  # key -> [fills in progress, write generation], only while a fill runs
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key, self._MISSING)
+        if entry is self._MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= self._timer():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._bump(key)
+        self._store(key, value)
+
+    def begin_fill(self, key) -> int:
+        """
+        Call before reading `key` from the source after a miss; pass the result to fill().
+        """
+        pending = self._fills.get(key)
+        if pending is None:
+            pending = self._fills[key] = [0, 0]
+        pending[0] += 1
+        return pending[1]
+
+    def fill(self, key, value, generation: int):
+        """
+        Finish a begin_fill(): store `value` unless it is None or the key was
+        written since. Call it even when the read failed.
+        """
+        pending = self._fills[key]
+        pending[0] -= 1
+        if pending[0] == 0:
+            del self._fills[key]
+        if value is not None and pending[1] == generation:
+            self._store(key, value)
+
+    def _bump(self, key):
+        pending = self._fills.get(key)
+        if pending is not None:
+            pending[1] += 1
+
+    def _store(self, key, value):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (self._timer() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key):
+        self._bump(key)
+        self._data.pop(key, None)
+
+    def clear(self):
+        for pending in self._fills.values():
+            pending[1] += 1
+        self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+        }
@@ -0,0 +1,73 @@
+# config.py
+import os
+
+# Any SQLAlchemy URL; the async driver is picked from it (see database.async_database_url)
+DATABASE_URL = os.getenv("LOCKER_DATABASE_URL", "sqlite:///./test.db")
+DB_ECHO = os.getenv("LOCKER_DB_ECHO", "0") == "1"
+
+# Pool sizing, applied to server databases (PostgreSQL, MySQL, ...)
+DB_POOL_SIZE = int(os.getenv("LOCKER_DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("LOCKER_DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("LOCKER_DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("LOCKER_DB_POOL_RECYCLE", "1800"))
+
+# SQLite tuning, applied to every new connection
+SQLITE_JOURNAL_MODE = os.getenv("LOCKER_SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("LOCKER_SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("LOCKER_SQLITE_BUSY_TIMEOUT_MS", "5000"))
+SQLITE_MMAP_SIZE = int(os.getenv("LOCKER_SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+# Largest batch accepted by POST /logs/batch
+LOG_BATCH_MAX_SIZE = int(os.getenv("LOCKER_LOG_BATCH_MAX_SIZE", "10000"))
+
+# Page sizes for the keyset-paginated list endpoints
+DEFAULT_PAGE_SIZE = int(os.getenv("LOCKER_DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("LOCKER_MAX_PAGE_SIZE", "500"))
+
+# Read-through cache for locker and transaction lookups. Writes in this
+# process invalidate it; the TTL bounds staleness from other workers.
+CACHE_MAX_ENTRIES = int(os.getenv("LOCKER_CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL_SECONDS = float(os.getenv("LOCKER_CACHE_TTL_SECONDS", "10"))
+
+# Push stream (/events): per-subscriber buffer and SSE keep-alive interval
+EVENT_QUEUE_SIZE = int(os.getenv("LOCKER_EVENT_QUEUE_SIZE", "100"))
+SSE_KEEPALIVE_SECONDS = float(os.getenv("LOCKER_SSE_KEEPALIVE_SECONDS", "15"))
+
+# Write-behind log buffer for log_service.send_log (off by default). POST /logs/
+# answers with the stored row and its id, so it always writes directly and is
+# not affected by this flag.
+LOG_BUFFER_ENABLED = os.getenv("LOCKER_LOG_BUFFER_ENABLED", "0") == "1"
+LOG_BUFFER_MAX_SIZE = int(os.getenv("LOCKER_LOG_BUFFER_MAX_SIZE", "10000"))
+LOG_BUFFER_BATCH_SIZE = int(os.getenv("LOCKER_LOG_BUFFER_BATCH_SIZE", "500"))
+LOG_BUFFER_FLUSH_SECONDS = float(os.getenv("LOCKER_LOG_BUFFER_FLUSH_SECONDS", "0.5"))
+
+# QR rendering: cache of encoded images and the batch process pool
+QR_CACHE_MAX_ENTRIES = int(os.getenv("LOCKER_QR_CACHE_MAX_ENTRIES", "1024"))
+QR_CACHE_TTL_SECONDS = float(os.getenv("LOCKER_QR_CACHE_TTL_SECONDS", "3600"))
+QR_POOL_WORKERS = int(os.getenv("LOCKER_QR_POOL_WORKERS", str(os.cpu_count() or 1)))
+QR_POOL_MIN_BATCH = int(os.getenv("LOCKER_QR_POOL_MIN_BATCH", "16"))
+
+# QR decoding: worker processes, largest side images are downscaled to, batch limit
+QR_DECODE_WORKERS = int(os.getenv("LOCKER_QR_DECODE_WORKERS", str(os.cpu_count() or 1)))
+QR_DECODE_MAX_SIDE = int(os.getenv("LOCKER_QR_DECODE_MAX_SIDE", "1024"))
+QR_DECODE_MAX_IMAGES = int(os.getenv("LOCKER_QR_DECODE_MAX_IMAGES", "32"))
+
+# Expiry of ongoing transactions past end_date (epoch seconds)
+EXPIRY_ENABLED = os.getenv("LOCKER_EXPIRY_ENABLED", "1") == "1"
+EXPIRY_BATCH_SIZE = int(os.getenv("LOCKER_EXPIRY_BATCH_SIZE", "500"))
+
+# Idempotency-Key replay store for POST endpoints
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("LOCKER_IDEMPOTENCY_MAX_KEYS", "50000"))
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("LOCKER_IDEMPOTENCY_TTL_SECONDS", "86400"))
+
+# Create missing tables when the app starts (otherwise run `python bootstrap.py` once per deployment)
+BOOTSTRAP_ON_STARTUP = os.getenv("LOCKER_BOOTSTRAP_ON_STARTUP", "0") == "1"
+
+# Rows fetched (and encoded) per chunk by the streaming log export
+EXPORT_CHUNK_SIZE = int(os.getenv("LOCKER_EXPORT_CHUNK_SIZE", "5000"))
+
+# Usage analytics: aggregation bucket width and rows loaded per refresh query
+ANALYTICS_BUCKET_SECONDS = int(os.getenv("LOCKER_ANALYTICS_BUCKET_SECONDS", "3600"))
+ANALYTICS_LOAD_CHUNK = int(os.getenv("LOCKER_ANALYTICS_LOAD_CHUNK", "100000"))
+# Ids below the high-water mark re-read on every refresh, for rows committed out of id order
+ANALYTICS_ID_OVERLAP = int(os.getenv("LOCKER_ANALYTICS_ID_OVERLAP", "1000"))
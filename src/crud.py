@@ -1,83 +1,415 @@
-from sqlalchemy.orm import Session
-import models, schemas
+# crud.py
+from typing import Optional
+from sqlalchemy import func, insert, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+import config, events, models, schemas
+from cache import TTLCache
 
-def create_organization(db: Session, org: schemas.OrganizationCreate):
-    db_org = models.Organization(username=org.username, password=org.password)
-    db.add(db_org)
-    db.commit()
-    db.refresh(db_org)
-    return db_org
+# Column snapshots keyed by primary key; hits are rebuilt into detached model
+# objects so callers never share (or mutate) the cached copy.
+locker_cache = TTLCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS)
+transaction_cache = TTLCache(config.CACHE_MAX_ENTRIES, config.CACHE_TTL_SECONDS)
 
-def create_transaction(db: Session, transaction: schemas.TransactionCreate):
-    db_trans = models.Transaction(**transaction.dict())
-    db.add(db_trans)
-    db.commit()
-    db.refresh(db_trans)
-    return db_trans
-                                                                                                                                                                                                                               # crud.py
-from sqlalchemy.orm import Session
-import models, schemas
+def _snapshot(row) -> dict:
+    return {column.key: getattr(row, column.key) for column in row.__table__.columns}
+
+async def _compare_and_set_state(db: AsyncSession, model, row_id: int, new_state: int, expected_state: Optional[int]):
+    """
+    Set `state` with a single `UPDATE ... [AND state = :expected] RETURNING` and
+    commit. Return the updated row, or None when the row is missing or was not
+    in `expected_state` (the caller lost the race).
+    """
+    stmt = update(model).where(model.id == row_id)
+    if expected_state is not None:
+        stmt = stmt.where(model.state == expected_state)
+    # populate_existing: an instance of this row already in the session's identity
+    # map would otherwise be returned as is, with its old state
+    stmt = stmt.values(state=new_state).returning(model).execution_options(
+        synchronize_session=False, populate_existing=True)
+    row = (await db.execute(stmt)).scalars().first()
+    await db.commit()
+    return row
+
+def cache_stats() -> dict:
+    return {"lockers": locker_cache.stats(), "transactions": transaction_cache.stats()}
+
+# ---------- Pagination ----------
+def encode_cursor(sort_value: int, row_id: int) -> str:
+    return f"{sort_value}:{row_id}"
+
+def decode_cursor(cursor: str) -> tuple[int, int]:
+    try:
+        sort_value, row_id = cursor.split(":")
+        return int(sort_value), int(row_id)
+    except ValueError:
+        raise ValueError(f"Malformed cursor: {cursor!r}")
+
+async def _keyset_page(db: AsyncSession, query, sort_column, id_column, cursor: Optional[str], limit: int):
+    """
+    Return one page of `query` ordered by (sort_column, id_column) and the cursor
+    of the next page (None on the last page). Seeks past the cursor instead of
+    using OFFSET, so every page costs the same no matter how deep it is.
+    Rows come back as plain dicts keyed by column name, ready to be encoded
+    without building an ORM object or pydantic model per row. Rows with a NULL
+    sort value are left out: they have no place in the keyset order that every
+    backend sorts the same way (the API never writes them).
+    """
+    query = query.filter(sort_column.is_not(None))
+    if cursor:
+        query = query.filter(tuple_(sort_column, id_column) > tuple_(*decode_cursor(cursor)))
+    query = query.order_by(sort_column, id_column).limit(limit + 1)
+    result = await db.execute(query)
+    keys = list(result.keys())
+    rows = [dict(zip(keys, row)) for row in result.fetchmany(limit + 1)]
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(last[sort_column.key], last[id_column.key])
 
 # ---------- Organization ----------
-def create_organization(db: Session, org: schemas.OrganizationCreate):
+async def create_organization(db: AsyncSession, org: schemas.OrganizationCreate):
     db_org = models.Organization(
         username=org.username,
         password=org.password
     )
     db.add(db_org)
-    db.commit()
-    db.refresh(db_org)
+    await db.commit()
+    await db.refresh(db_org)
     return db_org
 
-def get_organization_by_id(db: Session, org_id: int):
-    return db.query(models.Organization).filter(models.Organization.id == org_id).first()
+async def get_organization_by_id(db: AsyncSession, org_id: int):
+    result = await db.execute(select(models.Organization).filter(models.Organization.id == org_id))
+    return result.scalars().first()
+
+async def get_organization_by_username(db: AsyncSession, username: str):
+    result = await db.execute(select(models.Organization).filter(models.Organization.username == username))
+    return result.scalars().first()
 
 # ---------- Transaction ----------
-def create_transaction(db: Session, transaction: schemas.TransactionCreate):
+def _publish_transaction_state(db_trans):
+    events.publish(events.TRANSACTION_STATE, {
+        "transaction_id": db_trans.id,
+        "locker_id": db_trans.locker_id,
+        "state": db_trans.state,
+        "start_date": db_trans.start_date,
+        "end_date": db_trans.end_date,
+    })
+
+async def create_transaction(db: AsyncSession, transaction: schemas.TransactionCreate):
     db_trans = models.Transaction(**transaction.dict())
     db.add(db_trans)
-    db.commit()
-    db.refresh(db_trans)
+    await db.commit()
+    await db.refresh(db_trans)
+    _publish_transaction_state(db_trans)
+    return db_trans
+
+async def _select_transaction(db: AsyncSession, transaction_id: int):
+    result = await db.execute(select(models.Transaction).filter(models.Transaction.id == transaction_id))
+    return result.scalars().first()
+
+async def get_transaction(db: AsyncSession, transaction_id: int):
+    cached = transaction_cache.get(transaction_id)
+    if cached is not None:
+        return models.Transaction(**cached)
+    # A state update committed while the SELECT is in flight wins over its result
+    generation = transaction_cache.begin_fill(transaction_id)
+    db_trans = None
+    try:
+        db_trans = await _select_transaction(db, transaction_id)
+    finally:
+        transaction_cache.fill(transaction_id, _snapshot(db_trans) if db_trans else None, generation)
     return db_trans
 
-def get_transaction(db: Session, transaction_id: int):
-    return db.query(models.Transaction).filter(models.Transaction.id == transaction_id).first()
+async def list_transactions(
+    db: AsyncSession,
+    borrower: Optional[int] = None,
+    lender: Optional[int] = None,
+    state: Optional[int] = None,
+    start_from: Optional[int] = None,
+    start_to: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+):
+    query = select(*models.Transaction.__table__.columns)
+    if borrower is not None:
+        query = query.filter(models.Transaction.borrower == borrower)
+    if lender is not None:
+        query = query.filter(models.Transaction.lender == lender)
+    if state is not None:
+        query = query.filter(models.Transaction.state == state)
+    if start_from is not None:
+        query = query.filter(models.Transaction.start_date >= start_from)
+    if start_to is not None:
+        query = query.filter(models.Transaction.start_date < start_to)
+    return await _keyset_page(db, query, models.Transaction.start_date, models.Transaction.id, cursor, limit)
 
-def update_transaction_state(db: Session, transaction_id: int, new_state: int):
-    db_trans = get_transaction(db, transaction_id)
+async def update_transaction_state(
+    db: AsyncSession, transaction_id: int, new_state: int, expected_state: Optional[int] = None
+):
+    db_trans = await _compare_and_set_state(db, models.Transaction, transaction_id, new_state, expected_state)
     if db_trans:
-        db_trans.state = new_state
-        db.commit()
-        db.refresh(db_trans)
+        transaction_cache.set(transaction_id, _snapshot(db_trans))
+        _publish_transaction_state(db_trans)
+    else:
+        transaction_cache.invalidate(transaction_id)
     return db_trans
 
+async def update_transactions_state(
+    db: AsyncSession,
+    transaction_ids: list[int],
+    new_state: int,
+    expected_state: Optional[int] = None,
+    end_date_before: Optional[int] = None,
+) -> list:
+    """
+    Bulk version of update_transaction_state: one UPDATE for every id in
+    `transaction_ids`, optionally only those ending at or before
+    `end_date_before`. Return the updated transactions.
+    """
+    if not transaction_ids:
+        return []
+    updated = await _set_transactions_state(db, transaction_ids, new_state, expected_state, end_date_before)
+    await db.commit()
+    _after_transactions_state(updated)
+    return updated
+
+async def _set_transactions_state(
+    db: AsyncSession, transaction_ids: list[int], new_state: int,
+    expected_state: Optional[int], end_date_before: Optional[int],
+) -> list:
+    """
+    The UPDATE of update_transactions_state, without committing.
+    """
+    stmt = update(models.Transaction).where(models.Transaction.id.in_(transaction_ids))
+    if expected_state is not None:
+        stmt = stmt.where(models.Transaction.state == expected_state)
+    if end_date_before is not None:
+        stmt = stmt.where(models.Transaction.end_date <= end_date_before)
+    stmt = stmt.values(state=new_state).returning(models.Transaction).execution_options(
+        synchronize_session=False, populate_existing=True)
+    return list((await db.execute(stmt)).scalars().all())
+
+def _after_transactions_state(updated: list):
+    """
+    Cache invalidation and events for committed transaction state changes.
+    """
+    for db_trans in updated:
+        transaction_cache.invalidate(db_trans.id)
+        _publish_transaction_state(db_trans)
+
+async def expire_transactions(
+    db: AsyncSession,
+    transaction_ids: list[int],
+    new_state: int,
+    expected_state: int,
+    end_date_before: int,
+    locker_state: int,
+    locker_expected_state: int,
+) -> tuple[list, list[int]]:
+    """
+    Move the transactions of `transaction_ids` that are in `expected_state` and
+    end at or before `end_date_before` to `new_state`, and their lockers from
+    `locker_expected_state` to `locker_state`, in one database transaction.
+    Either both UPDATEs commit or neither does, so a failed batch leaves every
+    row as it was and can be retried. Caches and events are only touched after
+    the commit. Return the updated transactions and the ids of the lockers changed.
+    """
+    if not transaction_ids:
+        return [], []
+    updated = await _set_transactions_state(db, transaction_ids, new_state, expected_state, end_date_before)
+    locker_ids = [db_trans.locker_id for db_trans in updated if db_trans.locker_id is not None]
+    released = await _set_lockers_state(db, locker_ids, locker_state, locker_expected_state) if locker_ids else []
+    await db.commit()
+    _after_transactions_state(updated)
+    _after_lockers_state(released, locker_state)
+    return updated, released
+
+async def get_transaction_deadlines(db: AsyncSession, state: int) -> list[tuple[int, int]]:
+    """
+    Return (end_date, id) of every transaction in `state` that has an end_date.
+    """
+    result = await db.execute(
+        select(models.Transaction.end_date, models.Transaction.id)
+        .filter(models.Transaction.state == state, models.Transaction.end_date.is_not(None))
+    )
+    return [tuple(row) for row in result.all()]
+
+async def get_bookings(db: AsyncSession, states: tuple, ends_after: int) -> list[tuple[int, int, int, int]]:
+    """
+    Return (id, locker_id, start_date, end_date) of every transaction in one of
+    `states` that holds a locker and ends after `ends_after`.
+    """
+    result = await db.execute(
+        select(models.Transaction.id, models.Transaction.locker_id,
+               models.Transaction.start_date, models.Transaction.end_date)
+        .filter(models.Transaction.state.in_(states),
+                models.Transaction.locker_id.is_not(None),
+                models.Transaction.end_date > ends_after)
+    )
+    return [tuple(row) for row in result.all()]
+
+async def get_transaction_columns_after(db: AsyncSession, after_id: int, limit: int) -> list[tuple]:
+    """
+    Return (id, lender, start_date, end_date) of up to `limit` dated transactions
+    with id > after_id, in id order, for bulk (columnar) loading.
+    """
+    result = await db.execute(
+        select(models.Transaction.id, models.Transaction.lender,
+               models.Transaction.start_date, models.Transaction.end_date)
+        .filter(models.Transaction.id > after_id,
+                models.Transaction.start_date.is_not(None),
+                models.Transaction.end_date.is_not(None))
+        .order_by(models.Transaction.id)
+        .limit(limit)
+    )
+    return result.all()
+
 # ---------- Log ----------
-def create_log(db: Session, log_in: schemas.LogCreate):
+async def create_log(db: AsyncSession, log_in: schemas.LogCreate):
     db_log = models.Log(**log_in.dict())
     db.add(db_log)
-    db.commit()
-    db.refresh(db_log)
+    await db.commit()
+    await db.refresh(db_log)
+    events.publish(events.LOG_CREATED, {
+        "id": db_log.id,
+        "action": db_log.action,
+        "person": db_log.person,
+        "time": db_log.time,
+        "transaction_id": db_log.transaction_id,
+    })
     return db_log
 
-def get_log(db: Session, log_id: int):
-    return db.query(models.Log).filter(models.Log.id == log_id).first()
+async def create_logs(db: AsyncSession, logs_in: list[schemas.LogCreate]) -> int:
+    """
+    Insert many logs with a single executemany in one transaction.
+    Return the number of rows inserted.
+    """
+    if not logs_in:
+        return 0
+    rows = [log_in.dict() for log_in in logs_in]
+    await db.execute(insert(models.Log), rows)
+    await db.commit()
+    # One summary event per batch rather than one per row
+    events.publish(events.LOG_BATCH_CREATED, {
+        "count": len(rows),
+        "transaction_ids": sorted({row["transaction_id"] for row in rows if row["transaction_id"] is not None}),
+    })
+    return len(rows)
+
+async def get_log(db: AsyncSession, log_id: int):
+    result = await db.execute(select(models.Log).filter(models.Log.id == log_id))
+    return result.scalars().first()
+
+async def list_logs(
+    db: AsyncSession,
+    person: Optional[int] = None,
+    action: Optional[int] = None,
+    time_from: Optional[int] = None,
+    time_to: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+):
+    query = select(*models.Log.__table__.columns)
+    if person is not None:
+        query = query.filter(models.Log.person == person)
+    if action is not None:
+        query = query.filter(models.Log.action == action)
+    if time_from is not None:
+        query = query.filter(models.Log.time >= time_from)
+    if time_to is not None:
+        query = query.filter(models.Log.time < time_to)
+    return await _keyset_page(db, query, models.Log.time, models.Log.id, cursor, limit)
+
+async def get_log_times_after(db: AsyncSession, after_id: int, limit: int) -> list[tuple]:
+    """
+    Return (id, time) of up to `limit` timed logs with id > after_id, in id order.
+    """
+    result = await db.execute(
+        select(models.Log.id, models.Log.time)
+        .filter(models.Log.id > after_id, models.Log.time.is_not(None))
+        .order_by(models.Log.id)
+        .limit(limit)
+    )
+    return result.all()
 
 # ---------- Locker ----------
-def create_locker(db: Session, locker_in: schemas.LockerCreate):
+async def create_locker(db: AsyncSession, locker_in: schemas.LockerCreate):
     db_locker = models.Locker(**locker_in.dict())
     db.add(db_locker)
-    db.commit()
-    db.refresh(db_locker)
+    await db.commit()
+    await db.refresh(db_locker)
+    events.publish(events.LOCKER_STATE, {"locker_id": db_locker.id, "state": db_locker.state})
     return db_locker
 
-def get_locker(db: Session, locker_id: int):
-    return db.query(models.Locker).filter(models.Locker.id == locker_id).first()
+async def _select_locker(db: AsyncSession, locker_id: int):
+    result = await db.execute(select(models.Locker).filter(models.Locker.id == locker_id))
+    return result.scalars().first()
+
+async def get_locker(db: AsyncSession, locker_id: int):
+    cached = locker_cache.get(locker_id)
+    if cached is not None:
+        return models.Locker(**cached)
+    generation = locker_cache.begin_fill(locker_id)
+    locker = None
+    try:
+        locker = await _select_locker(db, locker_id)
+    finally:
+        locker_cache.fill(locker_id, _snapshot(locker) if locker else None, generation)
+    return locker
 
-def update_locker_state(db: Session, locker_id: int, new_state: int):
-    locker = get_locker(db, locker_id)
+async def update_locker_state(
+    db: AsyncSession, locker_id: int, new_state: int, expected_state: Optional[int] = None
+):
+    locker = await _compare_and_set_state(db, models.Locker, locker_id, new_state, expected_state)
     if locker:
-        locker.state = new_state
-        db.commit()
-        db.refresh(locker)
+        locker_cache.set(locker_id, _snapshot(locker))
+        events.publish(events.LOCKER_STATE, {"locker_id": locker_id, "state": new_state})
+    else:
+        locker_cache.invalidate(locker_id)
     return locker
-                                                                                                     
\ No newline at end of file
+
+async def update_lockers_state(
+    db: AsyncSession, locker_ids: list[int], new_state: int, expected_state: Optional[int] = None
+) -> list[int]:
+    """
+    Bulk version of update_locker_state: one UPDATE for every id in `locker_ids`.
+    Return the ids that were actually changed.
+    """
+    if not locker_ids:
+        return []
+    updated = await _set_lockers_state(db, locker_ids, new_state, expected_state)
+    await db.commit()
+    _after_lockers_state(updated, new_state)
+    return updated
+
+async def _set_lockers_state(
+    db: AsyncSession, locker_ids: list[int], new_state: int, expected_state: Optional[int]
+) -> list[int]:
+    """
+    The UPDATE of update_lockers_state, without committing.
+    """
+    stmt = update(models.Locker).where(models.Locker.id.in_(locker_ids))
+    if expected_state is not None:
+        stmt = stmt.where(models.Locker.state == expected_state)
+    stmt = stmt.values(state=new_state).returning(models.Locker.id).execution_options(synchronize_session=False)
+    return list((await db.execute(stmt)).scalars().all())
+
+def _after_lockers_state(locker_ids: list[int], new_state: int):
+    """
+    Cache invalidation and events for committed locker state changes.
+    """
+    for locker_id in locker_ids:
+        locker_cache.invalidate(locker_id)
+        events.publish(events.LOCKER_STATE, {"locker_id": locker_id, "state": new_state})
+
+async def count_lockers(db: AsyncSession) -> int:
+    return (await db.execute(select(func.count(models.Locker.id)))).scalar_one()
+
+async def get_locker_states(db: AsyncSession) -> list[tuple[int, int]]:
+    result = await db.execute(select(models.Locker.id, models.Locker.state))
+    return [tuple(row) for row in result.all()]
+
+async def get_locker_ids_by_state(db: AsyncSession, state: int) -> list[int]:
+    result = await db.execute(select(models.Locker.id).filter(models.Locker.state == state))
+    return list(result.scalars().all())
@@ -1,9 +1,83 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import config
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
+# Async driver used for each sync URL scheme
+ASYNC_DRIVERS = {
+    "sqlite": "aiosqlite",
+    "postgresql": "asyncpg",
+    "mysql": "aiomysql",
+}
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+def async_database_url(url: str) -> str:
+    """
+    Return the async-driver form of a database URL,
+    e.g. sqlite:///./test.db -> sqlite+aiosqlite:///./test.db.
+    URLs that already name a driver are returned unchanged.
+    """
+    parsed = make_url(url)
+    if "+" in parsed.drivername:
+        return url
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is None:
+        raise ValueError(f"No async driver known for '{parsed.drivername}'")
+    return parsed.set(drivername=f"{parsed.drivername}+{driver}").render_as_string(hide_password=False)
+
+def _is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets readers run next to the single writer; NORMAL is durable enough with WAL
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={config.SQLITE_JOURNAL_MODE}")
+    cursor.execute(f"PRAGMA synchronous={config.SQLITE_SYNCHRONOUS}")
+    cursor.execute(f"PRAGMA busy_timeout={config.SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute(f"PRAGMA mmap_size={config.SQLITE_MMAP_SIZE}")
+    cursor.close()
+
+def _engine_options(url: str) -> dict:
+    if _is_sqlite(url):
+        return {"connect_args": {"check_same_thread": False}}
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+def create_db_engine(url: str = config.DATABASE_URL):
+    """
+    Build the sync engine for a database URL, tuned for its backend.
+    """
+    db_engine = create_engine(url, echo=config.DB_ECHO, **_engine_options(url))
+    if _is_sqlite(url):
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+def create_async_db_engine(url: str = config.DATABASE_URL):
+    """
+    Build the async engine for a database URL, tuned for its backend.
+    """
+    db_engine = create_async_engine(async_database_url(url), echo=config.DB_ECHO, **_engine_options(url))
+    if _is_sqlite(url):
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    return db_engine
+
+engine = create_db_engine()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# The one pool shared by every router
+async_engine = create_async_db_engine()
+# expire_on_commit=False so returned rows stay readable after commit without lazy IO
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 Base = declarative_base()
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,22 @@
+# events.py
+# In-process hooks fired by the crud write paths. Listeners are plain
+# callables run synchronously on the event loop, so they must not block.
+from collections import defaultdict
+
+LOCKER_STATE = "locker_state"  # {"locker_id", "state"}
+TRANSACTION_STATE = "transaction_state"  # {"transaction_id", "locker_id", "state", "start_date", "end_date"}
+LOG_CREATED = "log_created"  # {"id", "action", "person", "time", "transaction_id"}
+LOG_BATCH_CREATED = "log_batch_created"  # {"count", "transaction_ids"}
+
+_listeners = defaultdict(list)
+
+def subscribe(topic: str, listener):
+    _listeners[topic].append(listener)
+
+def unsubscribe(topic: str, listener):
+    if listener in _listeners[topic]:
+        _listeners[topic].remove(listener)
+
+def publish(topic: str, payload: dict):
+    for listener in list(_listeners[topic]):
+        listener(payload)
@@ -0,0 +1,273 @@
+import math
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import FrameProtocol
+
+
+class CommandResult:
+    """Outcome of one command sent through a CommandPipeline."""
+
+    def __init__(self, slave_id, actor):
+        self.slave_id = slave_id
+        self.actor = actor
+        self.response = None
+        self.attempts = 0
+        self.latency = None
+
+    @property
+    def ok(self):
+        return self.response is not None
+
+    def __repr__(self):
+        status = "ok" if self.ok else "failed"
+        return f"CommandResult({self.slave_id!r}, {status}, attempts={self.attempts})"
+
+
+class _InFlight:
+    def __init__(self, index, slave, result):
+        self.index = index
+        self.slave = slave
+        self.result = result
+        self.seqs = []
+        self.future = None
+        self.deadline = 0.0
+        self.started = 0.0
+        # Earliest start and latest end of the reply to the last transmission
+        self.reply_start = 0.0
+        self.reply_end = 0.0
+
+
+class CommandPipeline:
+    """
+    Windowed UNLOCK commands across the slaves of one RS485 bus.
+
+    Commands are sent in bursts of up to `window`, each addressed to its own
+    slave, without waiting for replies in between. When every slave in the
+    burst negotiated FrameProtocol.BURST_VERSION, the burst is a single
+    UNLOCK_MANY frame per actor; otherwise it is one UNLOCK frame per command,
+    back to back.
+
+    Every command carries a reply slot: the number of reply ticks its slave
+    waits after receiving it. The master schedules the replies one after the
+    other, starting right after the burst. Each reply gets the airtime of that
+    reply plus the slaves' polling jitter, followed by room for the master's
+    ACK. When a reply arrives, its ACK is sent at once if it fits before the
+    next reply may start; it is held back until the burst is answered
+    otherwise. Replies are matched to their command by sender and sequence
+    number. A command with no reply by its deadline is retransmitted with a new
+    sequence number in the next burst, up to `max_retries` times; a late reply
+    to an earlier transmission still counts.
+    """
+    DEFAULT_WINDOW = 8
+    DEFAULT_TIMEOUT_MILLISECONDS = 400
+    DEFAULT_MAX_RETRIES = 2
+    # Added to FrameProtocol.SLAVE_POLL_MS for the slave's parsing before its wait starts
+    JITTER_MARGIN_MILLISECONDS = 3
+    # Worst-case delay between a reply arriving and its ACK being written
+    ACK_LATENCY_MILLISECONDS = 3
+
+    def __init__(self, window=DEFAULT_WINDOW, timeout_ms=DEFAULT_TIMEOUT_MILLISECONDS, max_retries=DEFAULT_MAX_RETRIES):
+        if window < 1:
+            raise ValueError("window must be at least 1")
+        self.window = window
+        self.timeout_ms = timeout_ms
+        self.max_retries = max_retries
+
+    def unlock_many(self, requests):
+        """
+        Unlocks several lockers, keeping up to `window` commands in flight.
+        Args:
+            requests (list[tuple[SlavePiLogic, str]]): (slave, actor) pairs.
+        Returns:
+            list[CommandResult]: One result per request, in request order. Commands
+            that were never answered have ok == False.
+        """
+        results = [CommandResult(slave.slave_id, actor) for slave, actor in requests]
+        for slave in {id(slave): slave for slave, _ in requests}.values():
+            if slave.protocol_version is None:
+                slave.negotiate()
+
+        queued = deque(_InFlight(index, slave, results[index]) for index, (slave, _) in enumerate(requests))
+        while queued:
+            burst = self._next_burst(queued)
+            sent = self._transmit(burst)
+            for command in reversed(burst[len(sent):]):
+                queued.appendleft(command)
+
+            in_flight = {command.future: command for command in sent}
+            held_acks, retries = [], []
+            while in_flight:
+                next_deadline = min(c.deadline for c in in_flight.values())
+                done, _ = wait(list(in_flight), timeout=max(0.0, next_deadline - time.monotonic()),
+                               return_when=FIRST_COMPLETED)
+                now = time.monotonic()
+                answered = []
+                for future in done:
+                    answered.append(in_flight.pop(future))
+                for future, command in list(in_flight.items()):
+                    if command.deadline > now or future.done():
+                        continue
+                    del in_flight[future]
+                    command.slave.reader.cancel(command.slave.slave_id, future)
+                    if future.cancelled():
+                        if command.result.attempts > self.max_retries:
+                            print(f"No reply from slave {command.slave.slave_id} after {command.result.attempts} attempts")
+                        else:
+                            retries.append(command)
+                    else:
+                        # The reply landed just as the deadline passed
+                        answered.append(command)
+                for command in answered:
+                    command.result.response = command.future.result()
+                    command.result.latency = now - command.started
+                    if self._ack_fits(command, in_flight.values()):
+                        self._ack(command)
+                    else:
+                        held_acks.append(command)
+            for command in held_acks:
+                self._ack(command)
+            queued.extendleft(reversed(retries))
+        return results
+
+    def _next_burst(self, queued):
+        """
+        Takes the next burst off the queue: up to `window` commands on the bus of the
+        first one, at most one per slave (a slave handles its commands one at a time).
+        """
+        burst, skipped, slaves = [], [], set()
+        bus = queued[0].slave.bus
+        while queued and len(burst) < self.window:
+            command = queued.popleft()
+            if command.slave.bus is not bus or id(command.slave) in slaves:
+                skipped.append(command)
+                continue
+            slaves.add(id(command.slave))
+            burst.append(command)
+        queued.extendleft(reversed(skipped))
+        return burst
+
+    def _frames(self, burst):
+        """
+        Splits a burst into frames: one UNLOCK_MANY frame per actor when every slave
+        supports it, one UNLOCK frame per command otherwise.
+        Returns:
+            list[tuple[bool, list[_InFlight]]]: (is UNLOCK_MANY, commands) per frame.
+        """
+        bus = burst[0].slave.bus
+        if not (bus.uses_binary()
+                and all(command.slave.protocol_version >= FrameProtocol.BURST_VERSION for command in burst)):
+            return [(False, [command]) for command in burst]
+        frames, by_actor = [], {}
+        for command in burst:
+            actor = command.result.actor
+            commands = by_actor.get(actor)
+            if commands is None or not FrameProtocol.unlock_many_fits(len(commands) + 1, actor):
+                commands = by_actor[actor] = []
+                frames.append((True, commands))
+            commands.append(command)
+        return frames
+
+    @staticmethod
+    def _encode(many, commands, slots, seqs):
+        if many:
+            entries = [(command.slave.slave_id, slot) for command, slot in zip(commands, slots)]
+            return FrameProtocol.encode_unlock_many(entries, commands[0].result.actor, seqs[0])
+        (command,) = commands
+        return command.slave.encode("UNLOCK", command.result.actor, slots[0], seqs[0])
+
+    def _plan(self, frames, bus):
+        """
+        Schedules the replies to frames sent from now on, one after the other.
+        Returns:
+            list[float]: The earliest start of each command's reply, in burst order;
+            shorter than the burst if later replies would not fit in a reply slot.
+        """
+        turnaround = bus.TURNAROUND_MILLISECONDS / 1000.0
+        ends, end = [], time.monotonic()
+        for many, commands in frames:
+            # Slot and sequence bytes have a fixed size in binary frames and at most 3 digits in JSON
+            size = len(self._encode(many, commands, [255] * len(commands), [255] * len(commands)))
+            end += FrameProtocol.airtime_ms(size, bus.baudrate) / 1000.0
+            ends.append(end)
+            end += turnaround
+        starts, next_free = [], end
+        for (many, commands), end in zip(frames, ends):
+            for command in commands:
+                tick = FrameProtocol.reply_tick_ms(command.slave.protocol_version) / 1000.0
+                slot = max(0, math.ceil((next_free - end) / tick - 1e-9))
+                if slot > 0xFF:
+                    return starts
+                starts.append(end + slot * tick)
+                next_free = self._reply_window(command, starts[-1])[1] + self._ack_room(command)
+        return starts
+
+    def _reply_window(self, command, start):
+        """(earliest start, latest end) of the reply when the slave's wait is meant to end at start."""
+        slave = command.slave
+        version = slave.protocol_version
+        jitter = (FrameProtocol.SLAVE_POLL_MS + self.JITTER_MARGIN_MILLISECONDS) / 1000.0
+        size = FrameProtocol.reply_size(version, slave.slave_id, command.result.actor)
+        airtime = FrameProtocol.airtime_ms(size, slave.bus.baudrate) / 1000.0
+        return start, start + jitter + airtime + FrameProtocol.SLAVE_TX_HOLD_MS / 1000.0
+
+    def _ack_room(self, command):
+        """
+        Time an ACK to command's reply keeps the bus busy, from the end of that reply.
+        The next reply is already scheduled, so the bus turnaround after the ACK is not needed.
+        """
+        slave = command.slave
+        airtime = FrameProtocol.airtime_ms(len(slave.encode("ACK", "Developer", 0, 255)), slave.bus.baudrate)
+        return (self.ACK_LATENCY_MILLISECONDS + airtime) / 1000.0
+
+    def _ack_fits(self, command, in_flight):
+        """True if an ACK sent now ends before any pending reply may start."""
+        pending = [c.reply_start for c in in_flight if not c.future.done()]
+        if not pending:
+            return True
+        hold = FrameProtocol.SLAVE_TX_HOLD_MS / 1000.0
+        return time.monotonic() + hold + self._ack_room(command) <= min(pending)
+
+    @staticmethod
+    def _ack(command):
+        # The slave keeps driving the line for a moment after its reply
+        time.sleep(FrameProtocol.SLAVE_TX_HOLD_MS / 1000.0)
+        command.slave.send_ack()
+
+    def _transmit(self, burst):
+        """
+        Puts a burst on the bus. Commands whose reply would be due later than a reply
+        slot can express are not sent.
+        Returns:
+            list[_InFlight]: The commands sent, in burst order.
+        """
+        bus = burst[0].slave.bus
+        frames = self._frames(burst)
+        starts = self._plan(frames, bus)
+        while len(starts) < len(burst) and len(burst) > 1:
+            burst = burst[:max(1, len(starts))]
+            frames = self._frames(burst)
+            starts = self._plan(frames, bus)
+        starts = iter(starts)
+        for many, commands in frames:
+            seqs = bus.next_seqs(len(commands))
+            planned = [next(starts) for _ in commands]
+            # Slots count from the end of this frame; late frames wait less
+            size = len(self._encode(many, commands, [255] * len(commands), seqs))
+            end = time.monotonic() + FrameProtocol.airtime_ms(size, bus.baudrate) / 1000.0
+            slots = []
+            for command, start, seq in zip(commands, planned, seqs):
+                tick = FrameProtocol.reply_tick_ms(command.slave.protocol_version) / 1000.0
+                slots.append(min(0xFF, max(0, math.ceil((start - end) / tick - 1e-9))))
+                command.seqs.append(seq)
+                command.future = command.slave.reader.expect(command.slave.slave_id, "UNLOCK", command.seqs)
+                if not command.result.attempts:
+                    command.started = time.monotonic()
+                command.result.attempts += 1
+                command.reply_start, command.reply_end = self._reply_window(command, end + slots[-1] * tick)
+                command.deadline = command.reply_end + self.timeout_ms / 1000.0
+            framed_message = self._encode(many, commands, slots, seqs)
+            if bus.transmit(framed_message):
+                print("Transmitted:", framed_message)
+        return burst
@@ -0,0 +1,285 @@
+"""
+Wire format shared by the master (CPython) and the slaves (MicroPython).
+
+Copy this file next to SlavePiPhysical.py on every slave board; it only uses
+modules available on both interpreters.
+
+Two framings can share the bus:
+
+  JSON (legacy, protocol 0)
+      ;;;{"assign_to": "...", "action": "UNLOCK", ...};;;
+
+  Binary (protocol 1), 12 bytes plus payload instead of ~100 bytes:
+      +-------+---------+--------+-----+--------+---------+---------+-------+
+      | A5 5A | version | length | seq | opcode | address | payload | crc16 |
+      |  2 B  |   1 B   |  1 B   | 1 B |  1 B   | 4 B BE  | length  | 2 B BE|
+      +-------+---------+--------+-----+--------+---------+---------+-------+
+      crc16 is CRC-16/CCITT-FALSE over version..payload. address is the numeric
+      locker id. Opcodes with REPLY_FLAG set travel slave -> master.
+      UNLOCK/LOCK commands carry [reply_slot][actor utf-8]; replies carry the actor.
+      UNLOCK_MANY (protocol 2) unlocks several lockers with one frame: address is
+      0 and the payload is [actor length][actor utf-8] followed by one
+      [address 4 B BE][reply_slot] entry per locker; entry i uses sequence
+      number seq + i. A reply_slot is the number of reply ticks (see
+      reply_tick_ms) the slave waits after the command before answering.
+
+Both ends decode into the same dict shape as the JSON frames, so the rest of the
+code does not care which framing was used: commands have "assign_to", replies
+have "locker_id", and both carry "action", "actor" and "seq".
+
+The binary framing is only used once every slave on a bus has answered a JSON
+HELLO with a protocol version >= BINARY_VERSION; slaves that never answer keep
+the JSON framing. UNLOCK_MANY is only sent to slaves that answered with
+BURST_VERSION; older binary firmware ignores the unknown opcode. The version
+byte of binary frames stays BINARY_VERSION.
+"""
+try:
+    import ujson as json
+except ImportError:
+    import json
+try:
+    import ustruct as struct
+except ImportError:
+    import struct
+
+JSON_VERSION = 0
+BINARY_VERSION = 1
+BURST_VERSION = 2
+PROTOCOL_VERSION = BURST_VERSION
+
+JSON_DELIMITER = b";;;"
+MAGIC = b"\xa5\x5a"
+HEADER_FORMAT = ">BBBBI"
+HEADER_SIZE = 8
+CRC_SIZE = 2
+MAX_PAYLOAD = 255
+MAX_BUFFER_BYTES = 1024
+
+# Unit of a command's reply_slot. The master schedules the replies to a burst
+# of commands with this resolution; the slot byte then covers 255 ticks.
+REPLY_TICK_MS = 2
+JSON_REPLY_TICK_MS = 8
+
+# Period of the slave's main loop, i.e. how late a slave may notice a command.
+# Every scheduled reply slot has to leave this much room.
+SLAVE_POLL_MS = 5
+# The slave keeps its driver enabled this long after a reply
+SLAVE_TX_HOLD_MS = 2
+
+BITS_PER_BYTE = 10
+
+REPLY_FLAG = 0x80
+OPCODES = {
+    "UNLOCK": 0x01,
+    "LOCK": 0x02,
+    "ACK": 0x03,
+    "UNLOCK_MANY": 0x04,
+}
+ACTIONS = {code: action for action, code in OPCODES.items()}
+MANY_ENTRY_SIZE = 5
+
+
+def reply_tick_ms(protocol_version):
+    return REPLY_TICK_MS if protocol_version >= BINARY_VERSION else JSON_REPLY_TICK_MS
+
+
+def airtime_ms(nbytes, baudrate):
+    """Time nbytes take on the wire at baudrate (8N1: 10 bits per byte)."""
+    return nbytes * BITS_PER_BYTE * 1000.0 / baudrate
+
+
+def reply_size(protocol_version, locker_id, actor):
+    """
+    Size in bytes of the slave's UNLOCK report to a command from actor, as built
+    by SlavePiPhysical._create_log_frame. JSON reports carry a timestamp, so their
+    size is an upper bound.
+    """
+    if protocol_version >= BINARY_VERSION:
+        return 2 + HEADER_SIZE + len(actor.encode()) + CRC_SIZE
+    report = {
+        'action': 'UNLOCK',
+        'actor': actor,
+        'locker_id': locker_id,
+        'seq': 255,
+        'timestamp': (9999, 12, 31, 23, 59, 59, 6, 366, -1),
+    }
+    return len(encode_json(report))
+
+
+def _make_crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC_TABLE = _make_crc_table()
+
+
+def crc16(data):
+    crc = 0xFFFF
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_TABLE[((crc >> 8) ^ byte) & 0xFF]
+    return crc
+
+
+def address_of(locker_id):
+    """Returns the 32-bit bus address of a locker id, or None if it has none."""
+    locker_id = str(locker_id)
+    if not locker_id.isdigit():
+        return None
+    address = int(locker_id)
+    return address if address <= 0xFFFFFFFF else None
+
+
+def encode(opcode, address, seq=0, payload=b""):
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError("Frame payload too long")
+    body = struct.pack(HEADER_FORMAT, BINARY_VERSION, len(payload), seq & 0xFF, opcode, address) + payload
+    return MAGIC + body + struct.pack(">H", crc16(body))
+
+
+def encode_command(action, slave_id, actor="", seq=0, slot=0):
+    """Binary frame for a master -> slave command."""
+    payload = b"" if action == "ACK" else bytes([slot & 0xFF]) + actor.encode()
+    return encode(OPCODES[action], address_of(slave_id), seq, payload)
+
+
+def encode_unlock_many(entries, actor="", seq=0):
+    """
+    Binary UNLOCK_MANY frame: one UNLOCK for each (slave_id, slot) in entries, the
+    i-th with sequence number seq + i.
+    """
+    actor = actor.encode()
+    payload = bytes([len(actor)]) + actor
+    for slave_id, slot in entries:
+        payload += struct.pack(">IB", address_of(slave_id), slot & 0xFF)
+    return encode(OPCODES["UNLOCK_MANY"], 0, seq, payload)
+
+
+def unlock_many_fits(count, actor):
+    """True if an UNLOCK_MANY frame for count lockers and actor fits in one frame."""
+    return 1 + len(actor.encode()) + count * MANY_ENTRY_SIZE <= MAX_PAYLOAD
+
+
+def encode_reply(action, locker_id, actor="", seq=0):
+    """Binary frame for a slave -> master report."""
+    return encode(OPCODES[action] | REPLY_FLAG, address_of(locker_id), seq, actor.encode())
+
+
+def encode_json(data):
+    return JSON_DELIMITER + json.dumps(data).encode() + JSON_DELIMITER
+
+
+def _decode_body(body):
+    """Returns the frames a binary body carries: UNLOCK_MANY expands into one UNLOCK per locker."""
+    version, length, seq, opcode, address = struct.unpack(HEADER_FORMAT, body[:HEADER_SIZE])
+    payload = body[HEADER_SIZE:HEADER_SIZE + length]
+    action = ACTIONS.get(opcode & ~REPLY_FLAG & 0xFF)
+    if action is None:
+        return []
+    if action == "UNLOCK_MANY" and not opcode & REPLY_FLAG:
+        return _decode_unlock_many(payload, seq, version)
+    frame = {"action": action, "seq": seq, "protocol": version}
+    if opcode & REPLY_FLAG:
+        frame["locker_id"] = str(address)
+        frame["actor"] = payload.decode()
+    else:
+        frame["assign_to"] = str(address)
+        if payload:
+            frame["slot"] = payload[0]
+            frame["actor"] = payload[1:].decode()
+    return [frame]
+
+
+def _decode_unlock_many(payload, seq, version):
+    if not payload:
+        return []
+    entries_start = 1 + payload[0]
+    actor = payload[1:entries_start].decode()
+    frames = []
+    for offset in range(entries_start, len(payload) - MANY_ENTRY_SIZE + 1, MANY_ENTRY_SIZE):
+        address, slot = struct.unpack(">IB", payload[offset:offset + MANY_ENTRY_SIZE])
+        frames.append({
+            "action": "UNLOCK",
+            "assign_to": str(address),
+            "actor": actor,
+            "slot": slot,
+            "seq": (seq + len(frames)) & 0xFF,
+            "protocol": version,
+        })
+    return frames
+
+
+class FrameParser:
+    """
+    Incremental decoder for a byte stream that may mix JSON and binary frames.
+    feed() returns the frames completed by the new bytes; partial frames are
+    kept until the rest arrives, and corrupt ones are skipped.
+    """
+
+    def __init__(self):
+        self._buffer = b""
+        self.crc_errors = 0
+
+    def feed(self, data):
+        self._buffer += data
+        frames = []
+        while True:
+            json_start = self._buffer.find(JSON_DELIMITER)
+            binary_start = self._buffer.find(MAGIC)
+            if json_start < 0 and binary_start < 0:
+                # Keep a possible partial delimiter or magic at the tail
+                self._buffer = self._buffer[-2:]
+                break
+            if binary_start >= 0 and (json_start < 0 or binary_start < json_start):
+                complete, frame = self._take_binary(binary_start)
+            else:
+                complete, frame = self._take_json(json_start)
+            if not complete:
+                if len(self._buffer) > MAX_BUFFER_BYTES:
+                    self._buffer = b""
+                break
+            if isinstance(frame, list):
+                frames.extend(frame)
+            elif frame is not None:
+                frames.append(frame)
+        return frames
+
+    def _take_json(self, start):
+        end = self._buffer.find(JSON_DELIMITER, start + 3)
+        if end < 0:
+            self._buffer = self._buffer[start:]
+            return False, None
+        try:
+            frame = json.loads(self._buffer[start + 3:end].decode())
+        except (ValueError, UnicodeError):
+            # We probably started reading mid-frame: treat the closing
+            # delimiter as the opening one of the next frame
+            self._buffer = self._buffer[end:]
+            return True, None
+        self._buffer = self._buffer[end + 3:]
+        return True, frame if isinstance(frame, dict) else None
+
+    def _take_binary(self, start):
+        self._buffer = self._buffer[start:]
+        if len(self._buffer) < 2 + HEADER_SIZE:
+            return False, None
+        total = 2 + HEADER_SIZE + self._buffer[3] + CRC_SIZE
+        if len(self._buffer) < total:
+            return False, None
+        body = self._buffer[2:total - CRC_SIZE]
+        (crc,) = struct.unpack(">H", self._buffer[total - CRC_SIZE:total])
+        if self._buffer[2] != BINARY_VERSION or crc != crc16(body):
+            # Not a frame after all (or corrupted): resync after this magic
+            self.crc_errors += 1
+            self._buffer = self._buffer[1:]
+            return True, None
+        self._buffer = self._buffer[total:]
+        try:
+            return True, _decode_body(body)
+        except (ValueError, UnicodeError, struct.error):
+            return True, None
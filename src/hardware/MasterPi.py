@@ -1,22 +1,69 @@
-from QRManager import QRManager
+from QRManager import QRManager, ReplayError
 from SlavePiLogic import SlavePiLogic
+from RS485Bus import RS485Bus
+from CommandPipeline import CommandPipeline, CommandResult
 
 class MasterPi(QRManager):
     def __init__(self):
         super().__init__("key.txt")
         self.slave_pi_logic: list[SlavePiLogic] = []
+        self.pipeline = CommandPipeline()
+        
+    def add_slave(self, slave_id, bus=None):
+        # Every slave shares the bus (one serial port and pigpio handle) unless told otherwise
+        slave = SlavePiLogic(slave_id, bus=bus or RS485Bus.shared())
+        self.slave_pi_logic.append(slave)
+        return slave
         
     def open(self, qr_code):    
-        payload = super().open(qr_code)
+        try:
+            payload = super().open(qr_code)
+        except ReplayError as e:
+            # Showing a QR code that was already used is expected; it must not stop the main loop
+            print(e)
+            self.qr_log = str(e)
+            return
         print(f"decrypted payload: {payload}")
         if payload is None:
             raise("Payload is None")
         for slave in self.slave_pi_logic:
             if slave.slave_id == payload['locker_id']:
                 log = slave.open(payload['actor'])
+                if log is not None:
+                    # The QR code is used up only once its locker has actually opened
+                    self.commit_request_id(payload)
                 # send MQTT message to server
                 self.send_log_to_server("test")
             
+    def open_many(self, requests):
+        """
+        Opens several lockers at once (e.g. a bank of lockers for a class pickup).
+        Commands are pipelined over the bus by CommandPipeline instead of waiting
+        for each locker in turn.
+        Args:
+            requests (list[tuple[str, str]]): (locker_id, actor) pairs.
+        Returns:
+            list[CommandResult]: One result per request, in request order.
+        """
+        slaves = {slave.slave_id: slave for slave in self.slave_pi_logic}
+        known = [(slaves[locker_id], actor) for locker_id, actor in requests if locker_id in slaves]
+        sent = iter(self.pipeline.unlock_many(known))
+        results = []
+        for locker_id, actor in requests:
+            if locker_id in slaves:
+                results.append(next(sent))
+            else:
+                print(f"Unknown locker {locker_id}")
+                results.append(CommandResult(locker_id, actor))
+        for result in results:
+            if result.ok:
+                self.send_log_to_server(result.response)
+        return results
+    
+    def open_all(self, actor="Emergency"):
+        """Emergency open of every locker attached to this master."""
+        return self.open_many([(slave.slave_id, actor) for slave in self.slave_pi_logic])
+            
     def send_log_to_server(self, log):
         pass
             
@@ -24,13 +71,16 @@ class MasterPi(QRManager):
         # Main loop for the MasterPi
         while True:
             self.process_camera()
+            # Frames are read by each port's SerialFrameReader thread; this only
+            # drains the unsolicited events (e.g. LOCK reports) it has queued
             for slave in self.slave_pi_logic:
                 log = slave._receive_data()
                 if log:
                     slave.send_ack()
         
-            
-master = MasterPi()
-master.slave_pi_logic.append(SlavePiLogic("1212312121"))  # Example of adding a slave
-master._activate_camera()
-master.main_loop()  # Start the main loop
\ No newline at end of file
+
+if __name__ == "__main__":
+    master = MasterPi()
+    master.add_slave("1212312121")  # Example of adding a slave
+    master._activate_camera()
+    master.main_loop()  # Start the main loop
@@ -6,6 +6,9 @@ from cryptography.fernet import Fernet
 import base64
 import hashlib
 
+class ReplayError(ValueError):
+    pass
+
 class QRManager:
     def __init__(self, key_file):
         self.key = self._read_key(key_file)
@@ -14,6 +17,9 @@ class QRManager:
         self.camera = None
         self.qr_log = None
         self.latest_qr = None
+        # request_id -> end of its QR validity window; each request_id opens only once.
+        # Ids are recorded by commit_request_id once the locker has actually opened.
+        self.used_request_ids = {}
         
     def extract_qr(self, qr_code: str):
         """
@@ -38,6 +44,8 @@ class QRManager:
 
         :param qr_code: The encrypted QR code as a string.
         :return: The decrypted JSON payload if the QR code is valid and within the time range, else None.
+        The request_id is not used up here: call commit_request_id(payload) once the unlock succeeded,
+        so a QR code whose unlock failed can be scanned again.
         """
         print(qr_code)
         payload = self.extract_qr(qr_code)
@@ -54,14 +62,38 @@ class QRManager:
                 end_time = datetime.datetime.fromisoformat(payload["end_date"])
                 now = datetime.datetime.now()
                 if start_time <= now <= end_time:
+                    self._check_request_id(payload['request_id'], now)
                     return payload
                 else:
                     raise ValueError("QR code is not valid within the specified time range")
             else:
                 raise ValueError("QR code is missing 'start_time' or 'end_time' fields")
+        except ReplayError:
+            raise
         except ValueError as e:
             print("Error processing payload timestamps:", e)
             raise ValueError("Invalid timestamp format in payload")
+
+    def _check_request_id(self, request_id, now):
+        """
+        Rejects a request_id that was used before.
+        A request_id is only remembered until its QR code expires; after that
+        the time-range check rejects the code anyway, which keeps the set small.
+
+        :raises ReplayError: If the request_id has already been honored.
+        """
+        self.used_request_ids = {rid: end for rid, end in self.used_request_ids.items() if end >= now}
+        if request_id in self.used_request_ids:
+            raise ReplayError(f"QR code request_id {request_id} has already been used")
+
+    def commit_request_id(self, payload):
+        """
+        Marks the request_id of a payload returned by open() as used, so the same
+        QR code cannot open the locker again. Call it only after the unlock succeeded.
+
+        :param payload: The payload returned by open().
+        """
+        self.used_request_ids[payload['request_id']] = datetime.datetime.fromisoformat(payload["end_date"])
         
     
     def process_camera(self):
@@ -0,0 +1,167 @@
+import threading
+import time
+
+import FrameProtocol
+from SerialFrameReader import SerialFrameReader
+
+
+class RS485Bus:
+    """
+    Shared owner of one half-duplex RS485 line.
+
+    A master may drive dozens of lockers over a single serial port. The bus
+    opens the port and the pigpio connection once, holds the DE/RE mode pin,
+    serializes transmit windows so two commands never overlap on the wire, and
+    runs the single SerialFrameReader that routes replies back to the slave that
+    sent them. Use RS485Bus.shared() to get the bus for a port; every
+    SlavePiLogic attached to it reuses the same handles.
+    """
+    TRANSMITTER = 1
+    RECEIVER = 0
+
+    RS485_MODE_PIN = 5
+    DEFAULT_PORT = '/dev/serial0'
+    DEFAULT_BAUDRATE = 9600
+
+    # Idle time left on the line after each frame so receivers can turn around
+    TURNAROUND_MILLISECONDS = 5
+
+    _buses = {}
+    _buses_lock = threading.Lock()
+
+    def __init__(self, port=DEFAULT_PORT, baudrate=DEFAULT_BAUDRATE, mode_pin=RS485_MODE_PIN, ser=None, pi=None):
+        """
+        Args:
+            port (str): Serial device of the RS485 transceiver.
+            baudrate (int): Line speed.
+            mode_pin (int): GPIO driving the transceiver's DE/RE pins.
+            ser, pi: Already opened serial port and pigpio handle; when omitted they
+                are opened here. Passing them in allows running without hardware.
+        """
+        self.port = port
+        self.baudrate = baudrate
+        self.mode_pin = mode_pin
+        self.ser = ser if ser is not None else self._open_serial(port, baudrate)
+        self.pi = pi if pi is not None else self._open_pigpio(mode_pin)
+        self._tx_lock = threading.Lock()
+        self._slaves = {}
+        self.reader = SerialFrameReader(self.ser) if self.ser else None
+        self.frames_transmitted = 0
+        self._seq = 0
+
+    @classmethod
+    def shared(cls, port=DEFAULT_PORT, baudrate=DEFAULT_BAUDRATE):
+        """Returns the process-wide bus for port, opening it on first use."""
+        with cls._buses_lock:
+            bus = cls._buses.get(port)
+            if bus is None:
+                bus = cls(port, baudrate)
+                cls._buses[port] = bus
+            return bus
+
+    @staticmethod
+    def _open_serial(port, baudrate):
+        import serial
+        try:
+            ser = serial.Serial(port, baudrate=baudrate, timeout=1)
+            print("Serial port initialized")
+            return ser
+        except Exception as e:
+            print("Error initializing serial communication:", e)
+            return None
+
+    def _open_pigpio(self, mode_pin):
+        import pigpio
+        pi = pigpio.pi("localhost", 8888)
+        pi.set_mode(mode_pin, pigpio.OUTPUT)
+        pi.write(mode_pin, self.RECEIVER)
+        return pi
+
+    # ---------- Slaves ----------
+
+    def attach(self, slave):
+        """Registers slave (anything with a slave_id) as a station on this bus."""
+        if slave.slave_id in self._slaves and self._slaves[slave.slave_id] is not slave:
+            raise ValueError(f"Slave {slave.slave_id} is already attached to {self.port}")
+        self._slaves[slave.slave_id] = slave
+        return self
+
+    def detach(self, slave):
+        self._slaves.pop(slave.slave_id, None)
+
+    def slave(self, slave_id):
+        return self._slaves.get(slave_id)
+
+    @property
+    def slaves(self):
+        return list(self._slaves.values())
+
+    def uses_binary(self):
+        """
+        True when every attached slave negotiated the binary framing. Every station
+        hears every frame, so a single legacy slave keeps the whole bus on JSON.
+        """
+        slaves = self.slaves
+        return bool(slaves) and all(
+            (getattr(s, 'protocol_version', None) or FrameProtocol.JSON_VERSION) >= FrameProtocol.BINARY_VERSION
+            for s in slaves
+        )
+
+    # ---------- Transmit ----------
+
+    def next_seq(self):
+        """Returns the next 8-bit sequence number for a command on this bus."""
+        with self._tx_lock:
+            self._seq = (self._seq + 1) & 0xFF
+            return self._seq
+
+    def next_seqs(self, count):
+        """Returns count consecutive sequence numbers, e.g. for the entries of one UNLOCK_MANY frame."""
+        with self._tx_lock:
+            first = self._seq + 1
+            self._seq = (self._seq + count) & 0xFF
+            return [(first + i) & 0xFF for i in range(count)]
+
+    def transmit(self, data):
+        """
+        Puts one frame on the wire. The DE/RE pin is held in transmitter mode only
+        for the duration of the write, and the lock guarantees that frames from
+        concurrent callers are sent one after another, never interleaved.
+        Returns:
+            bool: False if the serial port is not available.
+        """
+        if not self.ser:
+            print("Serial not initialized; cannot transmit.")
+            return False
+        with self._tx_lock:
+            self.pi.write(self.mode_pin, self.TRANSMITTER)
+            try:
+                self.ser.write(data)
+                self.ser.flush()
+            finally:
+                self.pi.write(self.mode_pin, self.RECEIVER)
+            self.frames_transmitted += 1
+            time.sleep(self.TURNAROUND_MILLISECONDS / 1000.0)
+        return True
+
+    # ---------- Receive ----------
+
+    def expect(self, slave_id, action):
+        return self.reader.expect(slave_id, action)
+
+    def cancel(self, slave_id, future):
+        self.reader.cancel(slave_id, future)
+
+    def events(self, slave_id):
+        return self.reader.events(slave_id)
+
+    def close(self):
+        if self.reader:
+            self.reader.stop()
+        if self.ser:
+            self.ser.close()
+        if self.pi:
+            self.pi.stop()
+        with self._buses_lock:
+            if self._buses.get(self.port) is self:
+                del self._buses[self.port]
@@ -0,0 +1,102 @@
+import queue
+import threading
+from concurrent.futures import Future
+
+from FrameProtocol import FrameParser
+
+
+class SerialFrameReader:
+    """
+    Background reader for one RS485 serial port, owned by its RS485Bus.
+
+    A single daemon thread owns every read from the port. Incoming bytes are
+    decoded by a FrameParser as they arrive (JSON or binary framing, see
+    FrameProtocol), and each frame is dispatched by its sender (the slave's
+    "locker_id" field):
+      - if a caller is waiting for that sender, action and sequence number
+        (see expect), the frame resolves that caller's Future;
+      - otherwise it is queued on the sender's event queue (see events), e.g.
+        a LOCK report sent when the door is closed.
+    Frames carrying "assign_to" are commands addressed to slaves and are ignored.
+    """
+
+    def __init__(self, ser):
+        self.ser = ser
+        self._parser = FrameParser()
+        self._pending = {}
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f"rs485-reader-{getattr(ser, 'port', '')}", daemon=True)
+        self._thread.start()
+
+    def expect(self, sender, action, seqs=None):
+        """
+        Registers interest in the next frame from sender with the given action.
+        Register before transmitting the command so a fast reply cannot be missed.
+        Args:
+            seqs (iterable of int, optional): Sequence numbers of the command (and of its
+                retransmissions) the reply may echo. Replies from legacy firmware carry no
+                "seq" and match on sender and action alone.
+        Returns:
+            Future: Resolved with the parsed frame (dict) when it arrives.
+        """
+        future = Future()
+        seqs = frozenset(seqs) if seqs is not None else None
+        with self._lock:
+            self._pending.setdefault(sender, []).append((action, seqs, future))
+        return future
+
+    def cancel(self, sender, future):
+        with self._lock:
+            waiters = self._pending.get(sender, [])
+            self._pending[sender] = [w for w in waiters if w[2] is not future]
+        future.cancel()
+
+    def events(self, sender):
+        """Returns the queue of unsolicited frames received from sender."""
+        with self._lock:
+            return self._queues.setdefault(sender, queue.Queue())
+
+    @property
+    def crc_errors(self):
+        return self._parser.crc_errors
+
+    def stop(self):
+        self._running = False
+        self._thread.join(timeout=2)
+
+    def _run(self):
+        while self._running:
+            try:
+                # Blocks for at most ser.timeout when the line is idle
+                chunk = self.ser.read(self.ser.in_waiting or 1)
+            except Exception as e:
+                print("Serial read error:", e)
+                self._running = False
+                break
+            if chunk:
+                self.feed(chunk)
+
+    def feed(self, data):
+        """Parses raw bytes and dispatches every frame they complete."""
+        for frame in self._parser.feed(data):
+            self._dispatch(frame)
+
+    def _dispatch(self, frame):
+        if 'assign_to' in frame:
+            return
+        sender = frame.get('locker_id')
+        action = frame.get('action')
+        seq = frame.get('seq')
+        print("Received:", frame)
+        with self._lock:
+            waiters = self._pending.get(sender, [])
+            for i, (expected, seqs, future) in enumerate(waiters):
+                if expected != action or future.done():
+                    continue
+                if seqs is None or seq is None or seq in seqs:
+                    del waiters[i]
+                    future.set_result(frame)
+                    return
+            self._queues.setdefault(sender, queue.Queue()).put(frame)
@@ -1,22 +1,21 @@
-import serial
 import time
 import datetime
-import json
-import pigpio
+import queue
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import FrameProtocol
+from RS485Bus import RS485Bus
 
 class SlavePiLogic:
     DELAY_HARDWARE_COMMAND_MILLISECONDS = 200
     WAITING_TIME_MILLISECONDS = 400
+    NEGOTIATION_ATTEMPTS = 3
     
-    TRANSMITTER = 1
-    RECEIVER = 0
-    
-    RS485_MODE_PIN = 5
-    
-    
-    def __init__(self, slave_pi_physical_id):
-        self._init_communication()
+    def __init__(self, slave_pi_physical_id, bus=None):
         self.slave_id = slave_pi_physical_id
+        # None until negotiate() runs; JSON_VERSION for slaves on the legacy firmware
+        self.protocol_version = None
+        self._init_communication(bus)
         self._test_connecting(slave_pi_physical_id)
     
     def open(self, actor):
@@ -27,117 +26,173 @@ class SlavePiLogic:
         Returns:
             dict: The response data received from the hardware, parsed as JSON.
         Behavior:
-            - Continuously transmits the "UNLOCK" command to the hardware.
-            - Waits for a response within a specified timeout period (WAITING_TIME_MILLISECONDS).
+            - Registers a pending reply with the port's SerialFrameReader, then transmits "UNLOCK".
+            - Only a reply echoing the sequence number of one of its transmissions is accepted.
+            - Returns as soon as the reader thread receives the slave's UNLOCK reply; neither
+              the command nor the acknowledgment adds a fixed post-transmit delay.
             - Sends an acknowledgment (send_ack) upon receiving a valid response.
-            - Retries the process if no response is received within the timeout period.
-            - Introduces a delay (DELAY_HARDWARE_COMMAND_MILLISECONDS) between retries.
+            - Retransmits if no response arrives within WAITING_TIME_MILLISECONDS.
         Raises:
             None: This method does not explicitly raise exceptions but may propagate exceptions
-            from _transmit_data, _receive_data, or send_ack if they occur.
+            from send or send_ack if they occur.
         """
-        start_time = datetime.datetime.now()
+        if self.reader is None:
+            print("Serial not initialized; cannot open.")
+            return None
+        if self.protocol_version is None:
+            self.negotiate()
+        # A late reply to an earlier transmission still counts
+        seqs = []
         while True:
-            self._transmit_data("UNLOCK", actor)
-            # Wait up to WAITING_TIME_MILLISECONDS for a response
-            while datetime.datetime.now() < start_time + datetime.timedelta(milliseconds=self.WAITING_TIME_MILLISECONDS):
-                # response is json data
-                response = self._receive_data()
-                if response:
-                    self.send_ack()
-                    return response
-                # Delay before trying again
-                time.sleep(self.DELAY_HARDWARE_COMMAND_MILLISECONDS / 1000.0)
-                start_time = datetime.datetime.now()
+            seqs.append(self.bus.next_seq())
+            reply = self.reader.expect(self.slave_id, "UNLOCK", seqs)
+            # send() has no post-transmit delay; RS485Bus already leaves the turnaround gap
+            self.send("UNLOCK", actor, seq=seqs[-1])
+            try:
+                response = reply.result(timeout=self.WAITING_TIME_MILLISECONDS / 1000.0)
+            except FutureTimeoutError:
+                self.reader.cancel(self.slave_id, reply)
+                continue
+            self.send_ack()
+            return response
     
     def send_ack(self):
-        self._transmit_data("ACK", "Developer")
+        self.send("ACK", "Developer")
     
-    def _init_communication(self):
+    def negotiate(self):
         """
-        Initializes communication interfaces for the hardware module.
-        This method sets up a serial communication interface on '/dev/serial0' 
-        with a baud rate of 9600 and a timeout of 1 second. It also initializes 
-        a pigpio connection to the localhost on port 8888, configures the 
-        RS485 mode pin as an output, and sets it to the receiver mode.
-        Raises:
-            Exception: If there is an error initializing the serial communication.
+        Asks the slave which frame protocol it speaks.
+        A JSON "HELLO" carrying our FrameProtocol.PROTOCOL_VERSION is sent; firmware that
+        supports the binary framing answers with the highest version both sides know.
+        Older firmware ignores the HELLO, so after NEGOTIATION_ATTEMPTS timeouts the slave
+        stays on JSON framing.
+        Returns:
+            int: The negotiated protocol version.
         """
-        try:
-            self.ser = serial.Serial('/dev/serial0', baudrate=9600, timeout=1)
-            print("Serial port initialized")
-        except Exception as e:
-            print("Error initializing serial communication:", e)
-            self.ser = None
-        self.pi = pigpio.pi("localhost", 8888)
-        self.rs485_mode_pin = self.RS485_MODE_PIN
-        self.pi.set_mode(self.rs485_mode_pin, pigpio.OUTPUT)
-        self.pi.write(self.rs485_mode_pin, self.RECEIVER)
+        version = FrameProtocol.JSON_VERSION
+        if self.reader is None or FrameProtocol.address_of(self.slave_id) is None:
+            attempts = 0
+        else:
+            attempts = self.NEGOTIATION_ATTEMPTS
+        hello = {
+            "assign_to": self.slave_id,
+            "action": "HELLO",
+            "protocol": FrameProtocol.PROTOCOL_VERSION
+        }
+        for _ in range(attempts):
+            reply = self.reader.expect(self.slave_id, "HELLO")
+            self.bus.transmit(FrameProtocol.encode_json(hello))
+            try:
+                response = reply.result(timeout=self.WAITING_TIME_MILLISECONDS / 1000.0)
+            except FutureTimeoutError:
+                self.reader.cancel(self.slave_id, reply)
+                continue
+            version = min(int(response.get("protocol", 0)), FrameProtocol.PROTOCOL_VERSION)
+            break
+        self.protocol_version = version
+        print(f"Slave {self.slave_id} uses frame protocol {version}")
+        return version
     
-    def _transmit_data(self, command, actor="Developer"):
+    def _init_communication(self, bus=None):
+        """
+        Attaches this slave to its RS485 bus.
+        All slaves on the same port share one RS485Bus (see RS485Bus.shared), which
+        owns the serial port, the pigpio connection and the RS485 mode pin, so adding
+        lockers does not open the port again.
+        Args:
+            bus (RS485Bus, optional): The bus to use. Defaults to the shared bus on '/dev/serial0'.
+        """
+        self.bus = bus if bus is not None else RS485Bus.shared()
+        self.bus.attach(self)
+        self.ser = self.bus.ser
+        self.pi = self.bus.pi
+        self.reader = self.bus.reader
+    
+    def _transmit_data(self, command, actor="Developer", slot=0, seq=None):
         """
         Transmits a command from the slave device to a connected system via serial communication.
         Args:
             command (str): The command to be transmitted.
             actor (str, optional): The entity initiating the command. Defaults to "Developer".
-        Attributes:
-            from_slave_id (str): The identifier of the slave device, retrieved from the instance attribute slave_id.
-            command (str): The command to be sent.
-            actor (str): The entity initiating the command.
-            timestamp (str): The ISO 8601 formatted timestamp of when the command is sent.
+            slot (int, optional): Reply ticks (see FrameProtocol.reply_tick_ms) the slave waits
+                before answering. Defaults to 0.
+            seq (int, optional): Sequence number to send; the bus's next one by default.
+        Returns:
+            int: The sequence number the slave echoes in its reply.
         Behavior:
-            - Constructs a JSON message containing the command, actor, slave ID, and timestamp.
-            - Frames the message with delimiters and sends it via the serial interface.
-            - Switches the RS485 mode pin to transmitter mode before sending and back to receiver mode after sending.
+            - Encodes a compact binary frame when every slave on the bus negotiated it
+              (see negotiate and FrameProtocol); otherwise constructs a JSON message
+              containing the command, actor, slave ID, sequence number, and timestamp.
+            - Frames the message and hands it to the shared RS485Bus, which
+              serializes transmit windows and drives the RS485 mode pin.
             - Prints the transmitted message or an error if the serial interface is not initialized.
             - Introduces a delay after transmission to ensure hardware stability.
-        Note:
-            The method assumes the presence of instance attributes ser, pi, rs485_mode_pin, 
-            TRANSMITTER, RECEIVER, and DELAY_HARDWARE_COMMAND_MILLISECONDS.
         """
+        seq = self.send(command, actor, slot, seq)
+        time.sleep(self.DELAY_HARDWARE_COMMAND_MILLISECONDS / 1000.0)
+        return seq
+    
+    def send(self, command, actor="Developer", slot=0, seq=None):
+        """
+        Encodes and transmits one command without the post-transmission delay of
+        _transmit_data. Used by CommandPipeline to put several commands for different
+        slaves on the bus back to back.
+        Returns:
+            int: The sequence number the slave echoes in its reply.
+        """
+        if seq is None:
+            seq = self.bus.next_seq()
+        framed_message = self.encode(command, actor, slot, seq)
+        if self.bus.transmit(framed_message):
+            print("Transmitted:", framed_message)
+        return seq
+
+    def encode(self, command, actor="Developer", slot=0, seq=0):
+        """
+        Frames one command for this slave in the framing the bus currently uses.
+        Returns:
+            bytes: A binary frame when every slave on the bus negotiated it, a JSON frame otherwise.
+        """
+        if self.bus.uses_binary():
+            return FrameProtocol.encode_command(command, self.slave_id, actor, seq, slot)
         data = {
             "assign_to": getattr(self, 'slave_id', None),
             "action": command,
             "actor": actor,
+            "seq": seq,
+            "slot": slot,
             "timestamp": datetime.datetime.now().isoformat()
         }
-        message = json.dumps(data)
-        framed_message = ";;;" + message + ";;;\n"
-        if self.ser:
-            self.pi.write(self.rs485_mode_pin, self.TRANSMITTER)
-            self.ser.write(framed_message.encode())
-            self.ser.flush()
-            self.pi.write(self.rs485_mode_pin, self.RECEIVER)
-            print("Transmitted:", framed_message)
-        else:
-            print("Serial not initialized; cannot transmit.")
-        time.sleep(self.DELAY_HARDWARE_COMMAND_MILLISECONDS / 1000.0)
+        return FrameProtocol.encode_json(data) + b"\n"
     
     def _receive_data(self):
         """
-        Receives and processes data from a serial connection.
-        This method reads data from a serial connection if available, switches the 
-        RS485 mode pin to receiver mode, and attempts to parse the received data 
-        as JSON. The data is expected to be enclosed within ";;;" delimiters. If 
-        the data is successfully parsed, it is returned; otherwise, an error is 
-        logged, and None is returned.
+        Returns the next unsolicited frame (e.g. a LOCK report) received from this slave.
+        Frames are read and parsed by the port's SerialFrameReader thread; replies to
+        commands issued through open() are delivered to open() and never show up here.
         Returns:
-            dict or None: The parsed JSON data as a dictionary if successful, 
+            dict or None: The parsed JSON data as a dictionary if one is queued,
                           otherwise None.
         """
-        if self.ser and self.ser.in_waiting > 0:
-            self.pi.write(self.rs485_mode_pin, self.RECEIVER)
-            raw = self.ser.readline().decode('utf-8', errors='ignore').strip()
-            if raw.startswith(";;;") and raw.endswith(";;;"):
-                data_str = raw[3:-3]
-                try:
-                    data = json.loads(data_str)
-                    print("Received:", data)
-                    return data
-                except Exception as e:
-                    print("Error parsing received data:", e)
-                    return None
-        return None
+        if self.reader is None:
+            return None
+        try:
+            return self.reader.events(self.slave_id).get_nowait()
+        except queue.Empty:
+            return None
+    
+    def wait_for_event(self, timeout=None):
+        """
+        Blocks until an unsolicited frame from this slave arrives or timeout (seconds) expires.
+        Returns:
+            dict or None: The parsed frame, or None on timeout.
+        """
+        if self.reader is None:
+            return None
+        try:
+            return self.reader.events(self.slave_id).get(timeout=timeout)
+        except queue.Empty:
+            return None
     
     def _test_connecting(self, slave_pi_physical_id):
         """
@@ -1,7 +1,7 @@
 from machine import Pin, UART
 import utime
-import ujson
 import json
+import FrameProtocol
 
 class SlavePiPhysical:
     # Hardware PIN
@@ -20,8 +20,15 @@ class SlavePiPhysical:
     
     # Time variable
     WAIT_FOR_ACK_TIMEOUT_MS = 700
+    # Keep the driver enabled until the last byte has left the UART
+    TX_HOLD_MS = FrameProtocol.SLAVE_TX_HOLD_MS
+    # The master schedules replies around how late a command may be noticed
+    LOOP_PERIOD_MS = FrameProtocol.SLAVE_POLL_MS
     
     def __init__(self):
+        # Framing of the last command received; reports are sent back in the same one
+        self.protocol_version = FrameProtocol.JSON_VERSION
+        self._reply_seq = 0
         self._assign_locker_id()
         self.setup_sensor_and_physical_output()
         self._setup_communication()
@@ -37,18 +44,20 @@ class SlavePiPhysical:
         """
         Unlocks the locker:
          - Sets the solenoid to OPEN state.
-         - Plays the buzzer for user feedback.
+         - Starts the buzzer for user feedback. The main loop turns it off, so the
+           locker keeps reading the bus meanwhile and can take the master's next
+           burst of commands right away.
         """
         print(f"Unlock command received from {actor}.")
         self.solenoid.value(self.OPEN)
-        self._transmit_data(self._create_framed_log_str('UNLOCK', actor))
-        self.play_buzzer(100)  # Activate buzzer for 100ms
+        self._transmit_data(self._create_log_frame('UNLOCK', actor))
+        self.start_buzzer(100)  # Sound the buzzer for 100ms
         print("Locker unlocked.")
         
     def lock(self, actor):
         print(f"Lock command received from {actor}.")
         self.solenoid.value(self.CLOSED)
-        self._transmit_data(self._create_framed_log_str('LOCK', actor))
+        self._transmit_data(self._create_log_frame('LOCK', actor))
         self.play_buzzer(100)  # Activate buzzer for 100ms
         print("Locker locked.")
         
@@ -60,14 +69,27 @@ class SlavePiPhysical:
             'action': action,
             'actor': actor,
             'locker_id': self.locker_id,
+            'seq': self._reply_seq,
             'timestamp': utime.localtime()
         }
         return json.dumps(log_data)
     
+    def _create_log_frame(self, action, actor):
+        """
+        Encodes a report in the framing the master last used with this locker:
+        a compact binary frame (see FrameProtocol) or the legacy ";;;" JSON frame.
+        """
+        if self.protocol_version >= FrameProtocol.BINARY_VERSION:
+            return FrameProtocol.encode_reply(action, self.locker_id, actor, self._reply_seq)
+        delimiter = FrameProtocol.JSON_DELIMITER
+        return delimiter + self._create_framed_log_str(action, actor).encode() + delimiter
+    
     def setup_sensor_and_physical_output(self):
         self.feedbackSW = Pin(self.FEEDBACK_SW_PIN, Pin.IN)        
         self.solenoid = Pin(self.SOLENOID_PIN, Pin.OUT)
         self.buzzer = Pin(self.BUZZER_PIN, Pin.OUT)
+        self._buzzer_started = 0
+        self._buzzer_ms = 0
         self.SW_feedback_prev_state = None
         self.SW_feedback_current_state = self.feedbackSW.value()
     
@@ -76,67 +98,85 @@ class SlavePiPhysical:
         self.uart = UART(0, baudrate=9600)
         self.RTen_pin.value(self.RECEIVE)
         self.uart.init(9600)
-        self.uart_buffer = ""
+        self.parser = FrameProtocol.FrameParser()
         
-    def _transmit_data(self, data):
+    def _transmit_data(self, frame):
         """
-        Transmits data over UART. The data is expected to be framed by ";;;" at the beginning and end.
+        Transmits one already framed report (see _create_log_frame) over UART.
+        The RS485 driver is only enabled while the bytes are on the wire so the
+        bus is free for the master and the other lockers right afterwards.
         """
-        framed_data = ';;;' + data + ';;;'
         self.RTen_pin.value(self.TRANSMIT)
-        self.uart.write(framed_data.encode())
-        print(f"Slave send data: {framed_data}")
+        self.uart.write(frame)
         self.uart.flush()
-        utime.sleep(1)
+        utime.sleep_ms(self.TX_HOLD_MS)
         self.RTen_pin.value(self.RECEIVE)
-        utime.sleep(0.2)
+        print(f"Slave send data: {frame}")
     
     def _receive_data(self):
         """
-        Receives data from UART. If data is available, it is expected to be framed
-        by ";;;" at the beginning and end. The method decodes the JSON payload and,
-        if the 'assign_to' field matches the local locker ID, processes the command.
+        Receives data from UART. Whatever is buffered is fed to a FrameProtocol.FrameParser,
+        which decodes both JSON and binary frames and keeps partial ones for the next call.
+        Commands whose 'assign_to' field matches the local locker ID are processed.
         """
-        utime.sleep(0.2)
-        if self.uart.any():
+        if not self.uart.any():
+            return
+        try:
+            data = self.uart.read()
+        except Exception as e:
+            print("UART read error:", e)
+            return
+        if not data:
+            return
+        for command in self.parser.feed(data):
+            if command.get('assign_to') != self.locker_id:
+                continue
+            action = command.get('action')
+            if action == "ACK":
+                continue
+            if action == "HELLO":
+                self._answer_hello(command)
+                continue
             try:
-                data = self.uart.readline().decode().strip()
-                self.uart_buffer += data
-                print(f"data in uart: {data}")
+                self._operate_command(command)
             except Exception as e:
-                print("UART read error:", e)
-                return
-            print(f"uart buffer: {self.uart_buffer}")
-            if self.uart_buffer.startswith(';;;') and self.uart_buffer.endswith(';;;'):
-                group_of_data = self.uart_buffer.split(';;;')
-                print(f"data in group_of_data: {group_of_data}")
-                data = group_of_data[1:-1]  # Extract the JSON part
-                self.uart_buffer = ""  # Clear the buffer after reading
-                # Remove the framing delimiters.
-                for command in data:
-                    try:
-                        json_data = ujson.loads(command)
-                        if json_data.get('assign_to') == self.locker_id:
-                            if json_data["action"] == "ACK":
-                                continue
-                            self._operate_command(json_data)
-                        else:
-                            print("Received command not intended for this locker.")
-                    except Exception as e:
-                        print("Error processing received data:", e)
-
+                print("Error processing received data:", e)
+    
+    def _answer_hello(self, command):
+        """
+        Replies to the master's protocol negotiation with the highest frame
+        protocol version both sides support. Always answered in JSON framing.
+        """
+        version = min(int(command.get('protocol', 0)), FrameProtocol.PROTOCOL_VERSION)
+        hello = {
+            'action': 'HELLO',
+            'locker_id': self.locker_id,
+            'protocol': version
+        }
+        self._transmit_data(FrameProtocol.encode_json(hello))
     
     def _operate_command(self, command):
         """
         Checks the action field in the received command.
-        Currently, only the 'UNLOCK' action is supported.
+        Currently, only the 'UNLOCK' action is supported. The reply echoes the
+        command's sequence number and is delayed by its reply slot, if any: the
+        number of reply ticks (FrameProtocol.reply_tick_ms) to wait.
         """
         action = command.get('action')
         actor = command.get('actor', 'Unknown')
-        if action == "UNLOCK":
-            self.unlock(actor)
-        else:
-            print(f"Unsupported command action received: {action}")
+        self.protocol_version = command.get('protocol', FrameProtocol.JSON_VERSION)
+        self._reply_seq = command.get('seq', 0)
+        try:
+            if action == "UNLOCK":
+                slot = command.get('slot', 0)
+                if slot:
+                    utime.sleep_ms(slot * FrameProtocol.reply_tick_ms(self.protocol_version))
+                self.unlock(actor)
+            else:
+                print(f"Unsupported command action received: {action}")
+        finally:
+            # Unsolicited reports (e.g. LOCK from the door switch) carry seq 0
+            self._reply_seq = 0
             
     def play_buzzer(self, duration_ms):
         """
@@ -146,6 +186,19 @@ class SlavePiPhysical:
         utime.sleep_ms(duration_ms)
         self.buzzer.value(0)  # Turn off the buzzer
         
+    def start_buzzer(self, duration_ms):
+        """
+        Turns the buzzer on for duration_ms without blocking; _update_buzzer turns it off.
+        """
+        self.buzzer.value(1)
+        self._buzzer_started = utime.ticks_ms()
+        self._buzzer_ms = duration_ms
+        
+    def _update_buzzer(self):
+        if self._buzzer_ms and utime.ticks_diff(utime.ticks_ms(), self._buzzer_started) >= self._buzzer_ms:
+            self.buzzer.value(0)
+            self._buzzer_ms = 0
+        
     def _update_SW_feedback(self):
         self.SW_feedback_prev_state = self.SW_feedback_current_state
         self.SW_feedback_current_state = self.feedbackSW.value()
@@ -162,12 +215,25 @@ class SlavePiPhysical:
         while True:
             self._receive_data()
             self._update_SW_feedback()
-            utime.sleep(0.1)
-            
-slave = SlavePiPhysical()
-slave.unlock('Test Actor')
-utime.sleep(2)
-slave.lock('Test Actor')
-slave.main_loop()
+            self._update_buzzer()
+            utime.sleep_ms(self.LOOP_PERIOD_MS)
+
+
+def main():
+    """
+    Firmware entry point. MicroPython runs the board's main.py as __main__, so
+    either deploy this file as main.py or have main.py do:
+        import SlavePiPhysical
+        SlavePiPhysical.main()
+    """
+    slave = SlavePiPhysical()
+    slave.unlock('Test Actor')
+    utime.sleep_ms(100)
+    slave._update_buzzer()
+    utime.sleep_ms(1900)
+    slave.lock('Test Actor')
+    slave.main_loop()
 
 
+if __name__ == "__main__":
+    main()
@@ -8,6 +8,7 @@ from io import BytesIO
 from cryptography.fernet import Fernet
 import json
 import hashlib
+import uuid
 
 with open('key.txt', 'rb') as kf:
     key = kf.read().strip()  # Read the key as bytes
@@ -36,7 +37,7 @@ def generate_qr(request):
             "end_date": end_date,
             "actor": username,
             "locker_id": locker_id,
-            "request_id": "1234567890",  # Example request ID, replace with actual logic if needed
+            "request_id": uuid.uuid4().hex,  # Unique per QR code; the locker honors each one only once
         }
         json_data = json.dumps(data).encode()
 
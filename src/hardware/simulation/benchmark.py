@@ -0,0 +1,159 @@
+"""
+Hardware-free throughput benchmark for the master's RS485 stack.
+
+Wires the real RS485Bus / SlavePiLogic / CommandPipeline to EmulatedSlave
+boards over an in-memory VirtualBus that models baud-rate airtime,
+collisions, noise and frame loss, then unlocks every locker for a number of
+rounds and reports unlocks per second and latency percentiles.
+
+Run from src/hardware:
+    python -m simulation.benchmark --slaves 16 --rounds 5
+    python -m simulation.benchmark --mode serial --slaves 4
+    python -m simulation.benchmark --loss 0.05 --noise 0.001 --legacy
+    python -m simulation.benchmark --compare --slaves 16 --rounds 2
+
+--compare runs both modes on the same setup and exits non-zero unless the
+pipeline unlocks at least --min-speedup times as many lockers per second as
+serial mode; run it before merging changes to the bus stack.
+"""
+import argparse
+import contextlib
+import copy
+import os
+import sys
+import time
+
+from simulation.emulated_slave import EmulatedSlave
+from simulation.virtual_bus import FakePi, VirtualBus
+from CommandPipeline import CommandPipeline
+from RS485Bus import RS485Bus
+from SlavePiLogic import SlavePiLogic
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run(args):
+    virtual_bus = VirtualBus(baudrate=args.baud, noise=args.noise, loss=args.loss, seed=args.seed)
+    bus = RS485Bus(port="virtual", baudrate=args.baud, ser=virtual_bus.endpoint("master"), pi=FakePi())
+    ids = [str(args.first_id + i) for i in range(args.slaves)]
+    boards = [EmulatedSlave(locker_id, virtual_bus.endpoint(locker_id), legacy=args.legacy).start() for locker_id in ids]
+    slaves = [SlavePiLogic(locker_id, bus=bus) for locker_id in ids]
+    pipeline = CommandPipeline(window=args.window, timeout_ms=args.timeout_ms, max_retries=args.retries)
+
+    try:
+        for slave in slaves:
+            slave.negotiate()
+        frames_before, bytes_before = virtual_bus.frames, virtual_bus.bytes_on_wire
+        latencies, attempts, failed = [], 0, 0
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            if args.mode == "pipeline":
+                for result in pipeline.unlock_many([(slave, "benchmark") for slave in slaves]):
+                    attempts += result.attempts
+                    if result.ok:
+                        latencies.append(result.latency)
+                    else:
+                        failed += 1
+            else:
+                for slave in slaves:
+                    began = time.perf_counter()
+                    slave.open("benchmark")
+                    latencies.append(time.perf_counter() - began)
+                    attempts += 1
+        elapsed = time.perf_counter() - start
+    finally:
+        for board in boards:
+            board.stop()
+        bus.close()
+
+    latencies.sort()
+    return {
+        "mode": args.mode,
+        "framing": "binary" if bus.uses_binary() else "json",
+        "requested": args.slaves * args.rounds,
+        "unlocked": len(latencies),
+        "failed": failed,
+        "retries": max(0, attempts - args.slaves * args.rounds),
+        "elapsed_s": elapsed,
+        "unlocks_per_s": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+        "frames": virtual_bus.frames - frames_before,
+        "bytes": virtual_bus.bytes_on_wire - bytes_before,
+        "collisions": virtual_bus.collisions,
+        "crc_errors": bus.reader.crc_errors,
+        "slave_unlocks": sum(board.unlocks for board in boards),
+    }
+
+
+def print_report(result, args):
+    print(f"{result['mode']} mode, {args.slaves} lockers x {args.rounds} rounds, {args.baud} baud, "
+          f"{result['framing']} framing, noise {args.noise}, loss {args.loss}")
+    print(f"{result['unlocked']}/{result['requested']} unlocks in {result['elapsed_s']:.2f}s: "
+          f"{result['unlocks_per_s']:.1f} unlocks/s")
+    print(f"latency ms   p50 {result['p50_ms']:8.1f}   p95 {result['p95_ms']:8.1f}   "
+          f"p99 {result['p99_ms']:8.1f}   max {result['max_ms']:8.1f}")
+    print(f"retries {result['retries']}, failed {result['failed']}, "
+          f"slave-side unlocks {result['slave_unlocks']}")
+    print(f"bus: {result['frames']} frames, {result['bytes']} bytes, "
+          f"{result['collisions']} collisions, {result['crc_errors']} CRC errors at the master")
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=("pipeline", "serial"), default="pipeline",
+                        help="CommandPipeline.unlock_many, or one SlavePiLogic.open after another")
+    parser.add_argument("--compare", action="store_true",
+                        help="run serial then pipeline mode and fail unless the pipeline is faster")
+    parser.add_argument("--min-speedup", type=float, default=1.0,
+                        help="with --compare, required pipeline / serial unlocks per second")
+    parser.add_argument("--slaves", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=5, help="times every locker is unlocked")
+    parser.add_argument("--baud", type=int, default=9600)
+    parser.add_argument("--noise", type=float, default=0.0, help="per-byte bit-flip probability")
+    parser.add_argument("--loss", type=float, default=0.0, help="per-receiver frame loss probability")
+    parser.add_argument("--legacy", action="store_true", help="emulate firmware without binary framing")
+    parser.add_argument("--window", type=int, default=CommandPipeline.DEFAULT_WINDOW)
+    parser.add_argument("--timeout-ms", type=int, default=CommandPipeline.DEFAULT_TIMEOUT_MILLISECONDS)
+    parser.add_argument("--retries", type=int, default=CommandPipeline.DEFAULT_MAX_RETRIES)
+    parser.add_argument("--first-id", type=int, default=1000, help="locker id of the first emulated board")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--verbose", action="store_true", help="keep the firmware and master print output")
+    args = parser.parse_args(argv)
+
+    if not args.compare:
+        result = run_quietly(args)
+        print_report(result, args)
+        return 0 if not result["failed"] else 1
+
+    results = {}
+    for mode in ("serial", "pipeline"):
+        mode_args = copy.copy(args)
+        mode_args.mode = mode
+        results[mode] = run_quietly(mode_args)
+        print_report(results[mode], mode_args)
+        print()
+    serial, pipeline = results["serial"]["unlocks_per_s"], results["pipeline"]["unlocks_per_s"]
+    speedup = pipeline / serial if serial else 0.0
+    print(f"pipeline / serial: {speedup:.2f}x (required > {args.min_speedup:.2f}x)")
+    if any(result["failed"] for result in results.values()) or speedup <= args.min_speedup:
+        return 1
+    return 0
+
+
+def run_quietly(args):
+    if args.verbose:
+        return run(args)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,66 @@
+"""
+SlavePiPhysical running on CPython against a VirtualBus endpoint.
+
+The command handling (frame parsing, HELLO negotiation, reply slots, UNLOCK
+replies) is the real firmware code; only the locker id source, the UART and
+the main loop's stop condition are replaced.
+"""
+import threading
+
+from simulation import micropython_shim
+
+micropython_shim.install()
+
+import utime  # noqa: E402
+from SlavePiPhysical import SlavePiPhysical  # noqa: E402
+
+
+class EmulatedSlave(SlavePiPhysical):
+    def __init__(self, locker_id, endpoint, legacy=False):
+        """
+        Args:
+            locker_id (str): Id the firmware would read from locker_id.txt.
+            endpoint (VirtualSerial): This board's connection to the virtual bus.
+            legacy (bool): Ignore HELLO like firmware without the binary framing.
+        """
+        self._emulated_locker_id = locker_id
+        self.endpoint = endpoint
+        self.legacy = legacy
+        self.unlocks = 0
+        self._running = False
+        self._thread = None
+        super().__init__()
+
+    def _assign_locker_id(self):
+        self.locker_id = self._emulated_locker_id
+
+    def _setup_communication(self):
+        super()._setup_communication()
+        self.uart.endpoint = self.endpoint
+
+    def _answer_hello(self, command):
+        if not self.legacy:
+            super()._answer_hello(command)
+
+    def unlock(self, actor):
+        self.unlocks += 1
+        super().unlock(actor)
+
+    def start(self):
+        """Runs the firmware's main loop body on a background thread."""
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name=f"slave-{self.locker_id}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._running = False
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def _loop(self):
+        while self._running:
+            self._receive_data()
+            self._update_SW_feedback()
+            self._update_buzzer()
+            utime.sleep_ms(self.LOOP_PERIOD_MS)
@@ -0,0 +1,75 @@
+"""
+CPython stand-ins for the MicroPython modules SlavePiPhysical imports
+(`machine` and `utime`), so the slave firmware can run against a VirtualBus.
+Call install() before importing SlavePiPhysical.
+"""
+import sys
+import time
+import types
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+
+    def __init__(self, pin_id, mode=IN):
+        self.id = pin_id
+        self.mode = mode
+        self._value = 0
+
+    def value(self, value=None):
+        if value is None:
+            return self._value
+        self._value = value
+
+
+class UART:
+    """machine.UART backed by a VirtualSerial endpoint (see EmulatedSlave)."""
+
+    def __init__(self, uart_id, baudrate=9600, endpoint=None):
+        self.id = uart_id
+        self.baudrate = baudrate
+        self.endpoint = endpoint
+
+    def init(self, baudrate=9600):
+        self.baudrate = baudrate
+
+    def any(self):
+        return self.endpoint.in_waiting if self.endpoint else 0
+
+    def read(self, nbytes=None):
+        if not self.any():
+            return None
+        return self.endpoint.read(nbytes or self.endpoint.in_waiting)
+
+    def write(self, data):
+        return self.endpoint.write(data) if self.endpoint else 0
+
+    def flush(self):
+        if self.endpoint:
+            self.endpoint.flush()
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    return module
+
+
+def install():
+    """Registers the stand-ins unless the real modules are importable."""
+    try:
+        import machine  # noqa: F401
+        return
+    except ImportError:
+        pass
+    sys.modules["machine"] = _module("machine", Pin=Pin, UART=UART)
+    sys.modules["utime"] = _module(
+        "utime",
+        sleep=time.sleep,
+        sleep_ms=lambda ms: time.sleep(ms / 1000.0),
+        localtime=time.localtime,
+        time=time.time,
+        ticks_ms=lambda: int(time.monotonic() * 1000),
+        ticks_diff=lambda a, b: a - b,
+    )
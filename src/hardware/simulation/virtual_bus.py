@@ -0,0 +1,132 @@
+"""
+In-memory half-duplex RS485 bus.
+
+Every VirtualSerial endpoint attached to a VirtualBus hears every byte the
+others write, after the airtime the frame would take at the configured baud
+rate (10 bits per byte). Overlapping transmissions garble each other the way
+two drivers fighting over the line would. On top of that, each receiver
+independently loses a whole write with probability `loss` and gets each byte
+bit-flipped with probability `noise`.
+"""
+import random
+import threading
+import time
+
+BITS_PER_BYTE = 10
+
+
+class VirtualBus:
+    def __init__(self, baudrate=9600, noise=0.0, loss=0.0, seed=None):
+        self.baudrate = baudrate
+        self.noise = noise
+        self.loss = loss
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._endpoints = []
+        self._active = []
+        self.bytes_on_wire = 0
+        self.frames = 0
+        self.collisions = 0
+
+    def endpoint(self, name):
+        serial = VirtualSerial(self, name)
+        with self._lock:
+            self._endpoints.append(serial)
+        return serial
+
+    def airtime(self, nbytes):
+        return nbytes * BITS_PER_BYTE / self.baudrate if self.baudrate else 0.0
+
+    def transmit(self, sender, data):
+        """Blocks for the frame's airtime, then delivers it to every other endpoint."""
+        data = bytes(data)
+        transmission = {"collided": False}
+        with self._lock:
+            for other in self._active:
+                other["collided"] = transmission["collided"] = True
+            if transmission["collided"]:
+                self.collisions += 1
+            self._active.append(transmission)
+            self.bytes_on_wire += len(data)
+            self.frames += 1
+        time.sleep(self.airtime(len(data)))
+        with self._lock:
+            self._active.remove(transmission)
+            receivers = [e for e in self._endpoints if e is not sender]
+            deliveries = [(e, self._corrupt(data, transmission["collided"])) for e in receivers]
+        for endpoint, payload in deliveries:
+            if payload:
+                endpoint._deliver(payload)
+
+    def _corrupt(self, data, collided):
+        if self.loss and self._rng.random() < self.loss:
+            return b""
+        if collided:
+            return bytes(self._rng.getrandbits(8) for _ in data)
+        if not self.noise:
+            return data
+        out = bytearray(data)
+        for i in range(len(out)):
+            if self._rng.random() < self.noise:
+                out[i] ^= 1 << self._rng.randrange(8)
+        return bytes(out)
+
+
+class VirtualSerial:
+    """The subset of pyserial's Serial used by RS485Bus and SerialFrameReader."""
+
+    def __init__(self, bus, name, timeout=1):
+        self.bus = bus
+        self.port = name
+        self.timeout = timeout
+        self._buffer = bytearray()
+        self._ready = threading.Condition()
+        self.is_open = True
+
+    @property
+    def in_waiting(self):
+        return len(self._buffer)
+
+    def _deliver(self, data):
+        with self._ready:
+            self._buffer += data
+            self._ready.notify_all()
+
+    def read(self, size=1):
+        """Returns up to size bytes, waiting at most timeout seconds for the first one."""
+        with self._ready:
+            if not self._buffer and self.is_open:
+                self._ready.wait(self.timeout)
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+    def write(self, data):
+        self.bus.transmit(self, data)
+        return len(data)
+
+    def flush(self):
+        # write() only returns once the frame has left the wire
+        pass
+
+    def close(self):
+        with self._ready:
+            self.is_open = False
+            self._ready.notify_all()
+
+
+class FakePi:
+    """Stands in for the pigpio connection; only remembers the pin levels."""
+    OUTPUT = 1
+
+    def __init__(self):
+        self.levels = {}
+
+    def set_mode(self, pin, mode):
+        pass
+
+    def write(self, pin, level):
+        self.levels[pin] = level
+
+    def stop(self):
+        pass
@@ -0,0 +1,109 @@
+# idempotency.py
+import asyncio
+import hashlib
+import json
+import config
+import metrics
+from cache import TTLCache
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+
+# POST paths whose responses are replayed for a repeated Idempotency-Key
+IDEMPOTENT_PATHS = {"/transactions/", "/logs/", "/logs/batch"}
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware that answers a repeated `Idempotency-Key` on the
+    configured POST paths with the response of the first request, so client
+    retries do not create duplicate rows. A retry arriving while the first
+    request is still running waits for it. A key reused with a different
+    request body is rejected with 422 rather than answered with a response
+    that belongs to another request. Responses with a 5xx status are not
+    stored, so those requests can be retried. Keys live in a bounded TTL store
+    local to this process.
+    """
+
+    def __init__(self, app, paths=IDEMPOTENT_PATHS, store: TTLCache = None):
+        self.app = app
+        self.paths = paths
+        self.store = store if store is not None else TTLCache(config.IDEMPOTENCY_MAX_KEYS, config.IDEMPOTENCY_TTL_SECONDS)
+        self._inflight = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        key = dict(scope["headers"]).get(IDEMPOTENCY_HEADER)
+        if key is None:
+            return await self.app(scope, receive, send)
+        store_key = (scope["path"], key)
+        # Replays and mismatches never reach the router; label them by path, which
+        # for these routes is also their template
+        scope[metrics.ROUTE_LABEL_SCOPE_KEY] = scope["path"]
+        body = await self._read_body(receive)
+        body_hash = hashlib.sha256(body).digest()
+
+        while True:
+            response = self.store.get(store_key)
+            if response is not None:
+                if response[0] != body_hash:
+                    return await self._reject_mismatch(send)
+                return await self._replay(response, send)
+            pending = self._inflight.get(store_key)
+            if pending is None:
+                break
+            # Same key still being handled: wait, then replay it or (if it failed) run this one
+            await asyncio.shield(pending)
+
+        inflight = asyncio.get_running_loop().create_future()
+        self._inflight[store_key] = inflight
+        captured = {"status": 500, "headers": [], "body": []}
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                captured["status"] = message["status"]
+                captured["headers"] = list(message.get("headers", []))
+            elif message["type"] == "http.response.body":
+                captured["body"].append(message.get("body", b""))
+            await send(message)
+
+        body_sent = False
+
+        async def replay_body():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        response = None
+        try:
+            await self.app(scope, replay_body, capture)
+            if captured["status"] < 500:
+                response = (body_hash, captured["status"], captured["headers"], b"".join(captured["body"]))
+                self.store.set(store_key, response)
+        finally:
+            del self._inflight[store_key]
+            inflight.set_result(response)
+
+    async def _read_body(self, receive) -> bytes:
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body", False):
+                break
+        return b"".join(chunks)
+
+    async def _reject_mismatch(self, send):
+        body = json.dumps({"detail": "Idempotency-Key was already used with a different request body"}).encode()
+        await send({"type": "http.response.start", "status": 422,
+                    "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def _replay(self, response, send):
+        _, status, headers, body = response
+        await send({"type": "http.response.start", "status": status, "headers": headers + [(REPLAYED_HEADER, b"true")]})
+        await send({"type": "http.response.body", "body": body})
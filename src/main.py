@@ -1,12 +1,46 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from database import Base, engine
+import config
+import metrics
+from database import AsyncSessionLocal, async_engine
+from idempotency import IdempotencyMiddleware
+from responses import FastJSONResponse
 from routers import organization, transaction, log, locker, locker_manager, locker_website
-from routers import auth 
+from routers import analytics, auth, cache, events, metrics as metrics_router, qr
+from services.locker_allocator import locker_allocator
+from services.booking_service import booking_index
+from services.expiry_service import expiry_scheduler
+from services.log_service import log_buffer
+from services.qr_service import shutdown_qr_pool
 
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # The schema is created by bootstrap.py, not on import
+    if config.BOOTSTRAP_ON_STARTUP:
+        from bootstrap import create_schema_async
+        await create_schema_async()
+    async with AsyncSessionLocal() as db:
+        await locker_allocator.rebuild(db)
+        await booking_index.rebuild(db)
+        if config.EXPIRY_ENABLED:
+            await expiry_scheduler.load(db)
+    if config.EXPIRY_ENABLED:
+        await expiry_scheduler.start()
+    if config.LOG_BUFFER_ENABLED:
+        await log_buffer.start()
+    try:
+        yield
+    finally:
+        await expiry_scheduler.stop()
+        await log_buffer.stop()
+        shutdown_qr_pool()
 
-app = FastAPI(title="Locker System API")
+app = FastAPI(title="Locker System API", lifespan=lifespan, default_response_class=FastJSONResponse)
+app.add_middleware(IdempotencyMiddleware)
+# Added last so it is outermost and times the whole request
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(async_engine.sync_engine)
 
 app.include_router(organization.router)
 app.include_router(transaction.router)
@@ -15,7 +49,12 @@ app.include_router(locker.router)
 app.include_router(locker_manager.router)
 app.include_router(locker_website.router)
 app.include_router(auth.router)
+app.include_router(cache.router)
+app.include_router(events.router)
+app.include_router(qr.router)
+app.include_router(metrics_router.router)
+app.include_router(analytics.router)
 
 @app.get("/")
-def root():
+async def root():
     return {"message": "Locker System API is running"}
@@ -0,0 +1,157 @@
+# metrics.py
+# Request and database metrics in Prometheus text format, without a client
+# library: each observation is a bisect and two additions.
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: tuple, label_names: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        self.label_names = label_names
+        self._series = {}  # label values -> [per-bucket counts (+Inf last), sum]
+
+    def observe(self, value: float, labels: tuple = ()):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        for labels, (counts, total) in sorted(self._series.items()):
+            label_str = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            prefix = label_str + "," if label_str else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{prefix}le="+Inf"}} {cumulative}')
+            suffix = f"{{{label_str}}}" if label_str else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names: tuple = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            label_str = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, labels))
+            lines.append(f"{self.name}{{{label_str}}} {value}" if label_str else f"{self.name} {value}")
+        return lines
+
+def gauge(name: str, help_text: str, samples: list) -> list:
+    """
+    Render a gauge from (labels dict, value) samples.
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+    for labels, value in samples:
+        label_str = ",".join(f'{key}="{val}"' for key, val in labels.items())
+        lines.append(f"{name}{{{label_str}}} {value}" if label_str else f"{name} {value}")
+    return lines
+
+ROUTE_LABELS = ("method", "route")
+# Scope key holding the route label of a request answered without reaching the router
+ROUTE_LABEL_SCOPE_KEY = "metrics.route"
+
+request_latency = Histogram("http_request_duration_seconds", "Request latency by route.", LATENCY_BUCKETS, ROUTE_LABELS)
+requests_total = Counter("http_requests_total", "Requests by route and status.", ROUTE_LABELS + ("status",))
+db_query_latency = Histogram("db_query_duration_seconds", "Latency of individual SQL statements.", LATENCY_BUCKETS)
+db_queries_per_request = Histogram("db_queries_per_request", "SQL statements issued per request.", QUERY_COUNT_BUCKETS, ROUTE_LABELS)
+db_time_per_request = Histogram("db_time_per_request_seconds", "Time spent in SQL per request.", LATENCY_BUCKETS, ROUTE_LABELS)
+in_flight = 0
+
+# [statement count, seconds] of the request being served, if any
+_request_db_usage: ContextVar = ContextVar("request_db_usage", default=None)
+
+# The start time lives on the statement's execution context rather than on the
+# connection, so a statement that fails (and never reaches after_cursor_execute)
+# leaves nothing behind.
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_query_start = time.perf_counter()
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, "_metrics_query_start", None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    db_query_latency.observe(elapsed)
+    usage = _request_db_usage.get()
+    if usage is not None:
+        usage[0] += 1
+        usage[1] += elapsed
+
+def instrument_engine(sync_engine):
+    """
+    Time every statement run on an engine (pass async_engine.sync_engine for async engines).
+    """
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording per-route latency, status counts, in-flight
+    requests and the SQL statements each request issued. Routes are labelled
+    by their path template, so ids do not create new series.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        global in_flight
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        usage = [0, 0.0]
+        token = _request_db_usage.set(usage)
+        in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_flight -= 1
+            _request_db_usage.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                label = route.path
+            else:
+                # Middleware that answers before routing (e.g. idempotent replays) may name the route
+                label = scope.get(ROUTE_LABEL_SCOPE_KEY, "unmatched")
+            labels = (scope["method"], label)
+            request_latency.observe(elapsed, labels)
+            requests_total.inc(labels + (str(status[0]),))
+            db_queries_per_request.observe(usage[0], labels)
+            db_time_per_request.observe(usage[1], labels)
+
+def render(extra_lines: list = ()) -> str:
+    lines = gauge("http_requests_in_flight", "Requests currently being served.", [({}, in_flight)])
+    for metric in (request_latency, requests_total, db_query_latency, db_queries_per_request, db_time_per_request):
+        lines.extend(metric.render())
+    lines.extend(extra_lines)
+    return "\n".join(lines) + "\n"
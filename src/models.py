@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -16,6 +16,17 @@ class Transaction(Base):
     start_date = Column(Integer)
     end_date = Column(Integer)
     state = Column(Integer)
+    locker_id = Column(Integer, nullable=True)
+
+    # Keyset pagination walks (start_date, id) inside each filter
+    __table_args__ = (
+        Index("ix_transactions_start_date_id", "start_date", "id"),
+        Index("ix_transactions_borrower_start_date_id", "borrower", "start_date", "id"),
+        Index("ix_transactions_lender_start_date_id", "lender", "start_date", "id"),
+        Index("ix_transactions_state_start_date_id", "state", "start_date", "id"),
+        # Expiry scheduler: ongoing transactions by deadline
+        Index("ix_transactions_state_end_date", "state", "end_date"),
+    )
 
 class Log(Base):
     __tablename__ = "logs"
@@ -24,6 +35,14 @@ class Log(Base):
     log_id = Column(Integer, unique=True)
     person = Column(Integer)
     time = Column(Integer)
+    transaction_id = Column(Integer, nullable=True)
+
+    # Keyset pagination walks (time, id) inside each filter
+    __table_args__ = (
+        Index("ix_logs_time_id", "time", "id"),
+        Index("ix_logs_person_time_id", "person", "time", "id"),
+        Index("ix_logs_action_time_id", "action", "time", "id"),
+    )
 
 class Locker(Base):
     __tablename__ = "lockers"
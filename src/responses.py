@@ -0,0 +1,20 @@
+# responses.py
+# JSON output through orjson when it is installed, the stdlib otherwise.
+import json
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as FastJSONResponse
+
+    def dumps(obj) -> str:
+        return orjson.dumps(obj).decode()
+else:
+    FastJSONResponse = JSONResponse
+
+    def dumps(obj) -> str:
+        return json.dumps(obj, separators=(",", ":"))
@@ -0,0 +1,21 @@
+import time
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_db
+from services.analytics_service import usage_summary
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+@router.get("/usage")
+async def usage(time_from: Optional[int] = None, time_to: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    """
+    Locker utilization, mean borrow duration, logs per hour of day and
+    transactions per organization over [time_from, time_to) (default: last 7 days).
+    """
+    time_to = time_to if time_to is not None else int(time.time())
+    time_from = time_from if time_from is not None else time_to - 7 * 24 * 3600
+    try:
+        return await usage_summary(db, time_from, time_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
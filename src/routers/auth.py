@@ -1,22 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import crud, schemas
-from database import SessionLocal
-import models
+from database import get_db
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/login")
-def login(username: str, password: str, db: Session = Depends(get_db)):
+async def login(username: str, password: str, db: AsyncSession = Depends(get_db)):
     # Simplified example
-    org = db.query(models.Organization).filter(models.Organization.username == username).first()
+    org = await crud.get_organization_by_username(db, username)
     if not org or org.password != password:
         raise HTTPException(status_code=400, detail="Incorrect username/password")
     return {"msg": "Login successful", "org_id": org.id}
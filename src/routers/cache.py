@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+import crud
+
+router = APIRouter(prefix="/cache", tags=["Cache"])
+
+@router.get("/stats")
+async def cache_stats():
+    return crud.cache_stats()
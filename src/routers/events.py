@@ -0,0 +1,77 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+import config
+from services.event_hub import STREAM_TOPICS, event_hub
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+def _parse_topics(topics: Optional[str]):
+    if not topics:
+        return None
+    requested = {topic.strip() for topic in topics.split(",") if topic.strip()}
+    unknown = requested - set(STREAM_TOPICS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown topics: {', '.join(sorted(unknown))}")
+    return requested
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    topics: Optional[str] = None,
+    locker_id: Optional[int] = None,
+    transaction_id: Optional[int] = None,
+):
+    """
+    Server-Sent Events stream of locker/transaction state changes and new logs.
+    `topics` is a comma-separated subset of the event topics.
+    """
+    subscriber = event_hub.subscribe(_parse_topics(topics), locker_id, transaction_id)
+
+    async def event_source():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), config.SSE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            event_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(event_source(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@router.websocket("/ws")
+async def events_websocket(
+    websocket: WebSocket,
+    topics: Optional[str] = None,
+    locker_id: Optional[int] = None,
+    transaction_id: Optional[int] = None,
+):
+    """
+    WebSocket variant of /events/stream: one JSON text message per event.
+    """
+    try:
+        requested = _parse_topics(topics)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    await websocket.accept()
+    subscriber = event_hub.subscribe(requested, locker_id, transaction_id)
+
+    async def forward():
+        while True:
+            await websocket.send_text(await subscriber.queue.get())
+
+    sender = asyncio.create_task(forward())
+    try:
+        # Incoming messages are ignored; receiving is how a disconnect is noticed
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        sender.cancel()
+        event_hub.unsubscribe(subscriber)
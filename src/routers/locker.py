@@ -1,24 +1,40 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 import crud, schemas
-from database import SessionLocal
+from database import get_db
+from services.booking_service import booking_index, check_window
 
 router = APIRouter(prefix="/lockers", tags=["Lockers"])
 
-def get_db():
-    db = SessionLocal()
+@router.post("/", response_model=schemas.LockerOut)
+async def create_locker(locker_in: schemas.LockerCreate, db: AsyncSession = Depends(get_db)):
+    return await crud.create_locker(db, locker_in)
+
+@router.get("/available")
+async def find_available_locker(start_date: int, end_date: int):
     try:
-        yield db
-    finally:
-        db.close()
+        check_window(start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    locker_id = booking_index.find_free_locker(start_date, end_date)
+    if locker_id is None:
+        return {"error": "No locker is free over this window"}
+    return {"locker_id": locker_id}
 
-@router.post("/", response_model=schemas.LockerOut)
-def create_locker(locker_in: schemas.LockerCreate, db: Session = Depends(get_db)):
-    return crud.create_locker(db, locker_in)
+@router.get("/{locker_id}/availability")
+async def check_locker_availability(locker_id: int, start_date: int, end_date: int):
+    try:
+        check_window(start_date, end_date)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"locker_id": locker_id, "free": booking_index.is_free(locker_id, start_date, end_date)}
 
 @router.put("/{locker_id}/change_state")
-def change_locker_state(locker_id: int, new_state: int, db: Session = Depends(get_db)):
-    locker = crud.update_locker_state(db, locker_id, new_state)
+async def change_locker_state(locker_id: int, new_state: int, expected_state: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    locker = await crud.update_locker_state(db, locker_id, new_state, expected_state)
     if not locker:
+        if expected_state is not None:
+            return {"error": f"Locker not found or not in state {expected_state}"}
         return {"error": "Locker not found"}
     return {"msg": f"Locker {locker_id} updated to state {new_state}"}
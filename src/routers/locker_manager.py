@@ -1,28 +1,33 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-import crud
-from database import SessionLocal
-from services.locker_service import assign_item_to_locker, open_locker
+from sqlalchemy.ext.asyncio import AsyncSession
+import crud, schemas
+from database import get_db
+from services.locker_service import allocate_locker, assign_item_to_locker, open_locker, release_lockers
 
 router = APIRouter(prefix="/locker_manager", tags=["Locker Manager"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/assign_item/{transaction_id}")
-def assign_item(transaction_id: int, db: Session = Depends(get_db)):
-    result = assign_item_to_locker(db, transaction_id)
+async def assign_item(transaction_id: int, db: AsyncSession = Depends(get_db)):
+    result = await assign_item_to_locker(db, transaction_id)
     if result:
         return {"msg": "Item assigned to locker successfully"}
     return {"error": "Could not assign item to locker"}
 
 @router.post("/open_locker/{locker_id}")
-def open_locker_route(locker_id: int, db: Session = Depends(get_db)):
-    success = open_locker(db, locker_id)
+async def open_locker_route(locker_id: int, db: AsyncSession = Depends(get_db)):
+    success = await open_locker(db, locker_id)
     if success:
         return {"msg": f"Locker {locker_id} opened successfully"}
     return {"error": "Unable to open locker"}
+
+@router.post("/allocate")
+async def allocate(db: AsyncSession = Depends(get_db)):
+    locker_id = await allocate_locker(db)
+    if locker_id is None:
+        return {"error": "No free locker"}
+    return {"locker_id": locker_id}
+
+@router.post("/release")
+async def release(release_in: schemas.LockerRelease, db: AsyncSession = Depends(get_db)):
+    released = await release_lockers(db, release_in.locker_ids)
+    return {"released": released}
@@ -1,20 +1,13 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import crud
-from database import SessionLocal
+from database import get_db
 
 router = APIRouter(prefix="/locker_website", tags=["Locker Website"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.get("/check_transaction/{transaction_id}")
-def check_transaction(transaction_id: int, db: Session = Depends(get_db)):
-    trans = crud.get_transaction(db, transaction_id)
+async def check_transaction(transaction_id: int, db: AsyncSession = Depends(get_db)):
+    trans = await crud.get_transaction(db, transaction_id)
     if not trans:
         return {"error": "Transaction not found"}
     return {
@@ -27,8 +20,8 @@ def check_transaction(transaction_id: int, db: Session = Depends(get_db)):
     }
 
 @router.put("/change_transaction_state/{transaction_id}")
-def change_transaction_state(transaction_id: int, new_state: int, db: Session = Depends(get_db)):
-    trans = crud.update_transaction_state(db, transaction_id, new_state)
+async def change_transaction_state(transaction_id: int, new_state: int, db: AsyncSession = Depends(get_db)):
+    trans = await crud.update_transaction_state(db, transaction_id, new_state)
     if not trans:
         return {"error": "Transaction not found or cannot be updated"}
     return {"msg": f"Transaction {transaction_id} state updated to {new_state}"}
@@ -1,24 +1,61 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-import crud, schemas
-from database import SessionLocal
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+import config, crud, schemas
+from database import get_db
+from responses import FastJSONResponse
+from services.export_service import EXPORT_FORMATS, export_logs
 
 router = APIRouter(prefix="/logs", tags=["Logs"])
 
-def get_db():
-    db = SessionLocal()
+@router.post("/", response_model=schemas.LogOut)
+async def create_log(log_in: schemas.LogCreate, db: AsyncSession = Depends(get_db)):
+    return await crud.create_log(db, log_in)
+
+@router.post("/batch", response_model=schemas.LogBatchOut)
+async def create_logs(batch: schemas.LogBatchCreate, db: AsyncSession = Depends(get_db)):
+    if len(batch.logs) > config.LOG_BATCH_MAX_SIZE:
+        raise HTTPException(status_code=413, detail=f"At most {config.LOG_BATCH_MAX_SIZE} logs per batch")
+    inserted = await crud.create_logs(db, batch.logs)
+    return {"inserted": inserted}
+
+@router.get("/", response_model=schemas.LogPage)
+async def list_logs(
+    person: Optional[int] = None,
+    action: Optional[int] = None,
+    time_from: Optional[int] = None,
+    time_to: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
     try:
-        yield db
-    finally:
-        db.close()
+        items, next_cursor = await crud.list_logs(db, person, action, time_from, time_to, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Rows are already plain dicts: skip per-row LogOut validation
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor})
 
-@router.post("/", response_model=schemas.LogOut)
-def create_log(log_in: schemas.LogCreate, db: Session = Depends(get_db)):
-    return crud.create_log(db, log_in)
+@router.get("/export")
+async def export(format: str = "csv", time_from: Optional[int] = None, time_to: Optional[int] = None):
+    """
+    Stream every log in [time_from, time_to) as csv, ndjson or arrow (IPC stream).
+    """
+    try:
+        body = export_logs(format, time_from, time_to)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    extension = "arrows" if format == "arrow" else format
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="logs.{extension}"'},
+    )
 
 @router.get("/{log_id}", response_model=schemas.LogOut)
-def get_log(log_id: int, db: Session = Depends(get_db)):
-    db_log = crud.get_log(db, log_id)
+async def get_log(log_id: int, db: AsyncSession = Depends(get_db)):
+    db_log = await crud.get_log(db, log_id)
     if not db_log:
         return {"error": "Log not found"}
     return db_log
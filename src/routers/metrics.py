@@ -0,0 +1,14 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+import crud, metrics
+
+router = APIRouter(tags=["Metrics"])
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    cache_stats = crud.cache_stats().items()
+    extra = metrics.gauge("cache_hit_rate", "Read-through cache hit rate.",
+                          [({"cache": name}, stats["hit_rate"]) for name, stats in cache_stats])
+    extra += metrics.gauge("cache_entries", "Read-through cache size.",
+                           [({"cache": name}, stats["size"]) for name, stats in cache_stats])
+    return PlainTextResponse(metrics.render(extra), media_type="text/plain; version=0.0.4")
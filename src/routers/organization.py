@@ -1,24 +1,17 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import crud, schemas
-from database import SessionLocal
+from database import get_db
 
 router = APIRouter(prefix="/organizations", tags=["Organizations"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/", response_model=schemas.OrganizationOut)
-def create_organization(org_in: schemas.OrganizationCreate, db: Session = Depends(get_db)):
-    return crud.create_organization(db, org_in)
+async def create_organization(org_in: schemas.OrganizationCreate, db: AsyncSession = Depends(get_db)):
+    return await crud.create_organization(db, org_in)
 
 @router.get("/{org_id}", response_model=schemas.OrganizationOut)
-def get_organization(org_id: int, db: Session = Depends(get_db)):
-    org = crud.get_organization_by_id(db, org_id)
+async def get_organization(org_id: int, db: AsyncSession = Depends(get_db)):
+    org = await crud.get_organization_by_id(db, org_id)
     if not org:
         return {"error": "Not found"}
     return org
@@ -0,0 +1,25 @@
+import json
+from typing import List
+from fastapi import APIRouter, File, HTTPException, UploadFile
+import config
+from services.qr_service import decode_qr_batch
+
+router = APIRouter(prefix="/qr", tags=["QR"])
+
+@router.post("/decode")
+async def decode_qr(files: List[UploadFile] = File(...)):
+    """
+    Decode one QR code per uploaded image. `data` holds the parsed JSON payload
+    when the text is JSON (encrypted kiosk codes are returned as text only).
+    """
+    if len(files) > config.QR_DECODE_MAX_IMAGES:
+        raise HTTPException(status_code=413, detail=f"At most {config.QR_DECODE_MAX_IMAGES} images per request")
+    images = [await upload.read() for upload in files]
+    results = []
+    for upload, text in zip(files, await decode_qr_batch(images)):
+        try:
+            data = json.loads(text) if text is not None else None
+        except ValueError:
+            data = None
+        results.append({"filename": upload.filename, "text": text, "data": data})
+    return {"results": results}
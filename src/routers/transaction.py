@@ -1,37 +1,60 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-import crud, schemas
-from database import SessionLocal
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+import config, crud, schemas
+from database import get_db
+from responses import FastJSONResponse
+from services.booking_service import BookingConflictError, create_transaction_checked
 from services.transaction_service import validate_transaction_for_open
 
 router = APIRouter(prefix="/transactions", tags=["Transactions"])
 
-def get_db():
-    db = SessionLocal()
+@router.post("/", response_model=schemas.TransactionOut)
+async def create_transaction(trans_in: schemas.TransactionCreate, db: AsyncSession = Depends(get_db)):
     try:
-        yield db
-    finally:
-        db.close()
+        return await create_transaction_checked(db, trans_in)
+    except BookingConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-@router.post("/", response_model=schemas.TransactionOut)
-def create_transaction(trans_in: schemas.TransactionCreate, db: Session = Depends(get_db)):
-    return crud.create_transaction(db, trans_in)
+@router.get("/", response_model=schemas.TransactionPage)
+async def list_transactions(
+    borrower: Optional[int] = None,
+    lender: Optional[int] = None,
+    state: Optional[int] = None,
+    start_from: Optional[int] = None,
+    start_to: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(config.DEFAULT_PAGE_SIZE, ge=1, le=config.MAX_PAGE_SIZE),
+    db: AsyncSession = Depends(get_db),
+):
+    try:
+        items, next_cursor = await crud.list_transactions(
+            db, borrower, lender, state, start_from, start_to, cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Rows are already plain dicts: skip per-row TransactionOut validation
+    return FastJSONResponse({"items": items, "next_cursor": next_cursor})
 
 @router.get("/{transaction_id}", response_model=schemas.TransactionOut)
-def read_transaction(transaction_id: int, db: Session = Depends(get_db)):
-    trans = crud.get_transaction(db, transaction_id)
+async def read_transaction(transaction_id: int, db: AsyncSession = Depends(get_db)):
+    trans = await crud.get_transaction(db, transaction_id)
     if not trans:
         return {"error": "Transaction not found"}
     return trans
 
 @router.put("/{transaction_id}/change_state")
-def change_transaction_state(transaction_id: int, new_state: int, db: Session = Depends(get_db)):
-    trans = crud.update_transaction_state(db, transaction_id, new_state)
+async def change_transaction_state(transaction_id: int, new_state: int, expected_state: Optional[int] = None, db: AsyncSession = Depends(get_db)):
+    trans = await crud.update_transaction_state(db, transaction_id, new_state, expected_state)
     if not trans:
+        if expected_state is not None:
+            return {"error": f"Cannot update. Transaction not found or not in state {expected_state}."}
         return {"error": "Cannot update. Transaction not found."}
     return {"msg": f"State updated to {new_state}"}
 
 @router.get("/{transaction_id}/validate")
-def validate_for_open(transaction_id: int, db: Session = Depends(get_db)):
-    is_valid = validate_transaction_for_open(db, transaction_id)
+async def validate_for_open(transaction_id: int, db: AsyncSession = Depends(get_db)):
+    is_valid = await validate_transaction_for_open(db, transaction_id)
     return {"valid": is_valid}
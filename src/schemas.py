@@ -1,6 +1,6 @@
 # schemas.py
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
 # ----- Organization -----
 class OrganizationBase(BaseModel):
@@ -31,6 +31,10 @@ class TransactionOut(TransactionBase):
     class Config:
         orm_mode = True
 
+class TransactionPage(BaseModel):
+    items: List[TransactionOut]
+    next_cursor: Optional[str] = None
+
 # ----- Log -----
 class LogBase(BaseModel):
     action: int
@@ -46,6 +50,16 @@ class LogOut(LogBase):
     class Config:
         orm_mode = True
 
+class LogPage(BaseModel):
+    items: List[LogOut]
+    next_cursor: Optional[str] = None
+
+class LogBatchCreate(BaseModel):
+    logs: List[LogCreate]
+
+class LogBatchOut(BaseModel):
+    inserted: int
+
 # ----- Locker -----
 class LockerBase(BaseModel):
     state: int
@@ -57,3 +71,6 @@ class LockerOut(LockerBase):
     id: int
     class Config:
         orm_mode = True
+
+class LockerRelease(BaseModel):
+    locker_ids: List[int]
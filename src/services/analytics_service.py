@@ -0,0 +1,192 @@
+# services/analytics_service.py
+import asyncio
+from collections import defaultdict
+from sqlalchemy.ext.asyncio import AsyncSession
+import config, crud
+
+HOURS_PER_DAY = 24
+
+def _add_counts(target: dict, keys, values):
+    """
+    Add `values` into `target[key]` after summing them per distinct key.
+    """
+    import numpy as np
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = np.bincount(inverse, weights=values, minlength=len(unique))
+    for key, total in zip(unique.tolist(), sums.tolist()):
+        target[key] += total
+
+class UsageAnalytics:
+    """
+    Locker usage aggregates kept per time bucket (an hour by default).
+
+    Rows are only ever counted once: each refresh fetches the logs and
+    transactions added since the last one (by id) as columns, aggregates them
+    with NumPy and adds the results into the per-bucket totals. A request then
+    only sums the buckets of its window.
+
+    Ids from a sequence (PostgreSQL, MySQL) can commit out of order, so a row
+    with an id below the high-water mark may only become visible later. Each
+    refresh therefore re-reads the last `id_overlap` ids below the mark and
+    skips the ones already counted; a row committed more than `id_overlap` ids
+    late is still missed.
+
+    Transactions are bucketed by booked window (start_date..end_date) and
+    counted once, when first loaded; their dates are not expected to change.
+    Times are epoch seconds and hour-of-day is UTC.
+    """
+
+    def __init__(self, bucket_seconds: int = config.ANALYTICS_BUCKET_SECONDS,
+                 load_chunk: int = config.ANALYTICS_LOAD_CHUNK,
+                 id_overlap: int = config.ANALYTICS_ID_OVERLAP):
+        self.bucket_seconds = bucket_seconds
+        self.load_chunk = load_chunk
+        self.id_overlap = id_overlap
+        self._log_high_water = 0
+        self._transaction_high_water = 0
+        # Ids counted within id_overlap of each high-water mark
+        self._seen_log_ids = set()
+        self._seen_transaction_ids = set()
+        self.log_counts = defaultdict(float)  # bucket -> logs
+        self.transaction_counts = defaultdict(float)  # start bucket -> transactions
+        self.duration_sums = defaultdict(float)  # start bucket -> sum of end - start
+        self.organization_counts = defaultdict(float)  # (start bucket, lender) -> transactions
+        self.occupied_seconds = defaultdict(float)  # bucket -> booked locker-seconds
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, db: AsyncSession):
+        async with self._lock:
+            after = max(0, self._log_high_water - self.id_overlap)
+            while True:
+                rows = await crud.get_log_times_after(db, after, self.load_chunk)
+                if rows:
+                    after = rows[-1][0]
+                    self._log_high_water, fresh = self._unseen(rows, self._seen_log_ids, self._log_high_water)
+                    if fresh:
+                        self._add_logs(fresh)
+                if len(rows) < self.load_chunk:
+                    break
+            after = max(0, self._transaction_high_water - self.id_overlap)
+            while True:
+                rows = await crud.get_transaction_columns_after(db, after, self.load_chunk)
+                if rows:
+                    after = rows[-1][0]
+                    self._transaction_high_water, fresh = self._unseen(
+                        rows, self._seen_transaction_ids, self._transaction_high_water)
+                    if fresh:
+                        self._add_transactions(fresh)
+                if len(rows) < self.load_chunk:
+                    break
+
+    def _unseen(self, rows, seen: set, high_water: int):
+        """
+        Drop rows (id first, in id order) already counted, record the rest in
+        `seen` and return the new high-water mark with the rows left.
+        """
+        rows = [row for row in rows if row[0] not in seen]
+        if not rows:
+            return high_water, rows
+        seen.update(row[0] for row in rows)
+        high_water = max(high_water, rows[-1][0])
+        floor = high_water - self.id_overlap
+        if len(seen) > 2 * self.id_overlap:
+            # Ids at or below the floor are never read again
+            seen.difference_update([row_id for row_id in seen if row_id <= floor])
+        return high_water, rows
+
+    def _add_logs(self, rows):
+        import numpy as np
+        columns = np.array(rows, dtype=np.int64)
+        times = columns[:, 1]
+        _add_counts(self.log_counts, times // self.bucket_seconds, np.ones(len(times)))
+
+    def _add_transactions(self, rows):
+        import numpy as np
+        columns = np.array(rows, dtype=np.int64)
+        keep = columns[:, 3] > columns[:, 2]
+        lenders, starts, ends = columns[keep, 1], columns[keep, 2], columns[keep, 3]
+        if not len(starts):
+            return
+        width = self.bucket_seconds
+        start_buckets = starts // width
+        _add_counts(self.transaction_counts, start_buckets, np.ones(len(starts)))
+        _add_counts(self.duration_sums, start_buckets, (ends - starts).astype(np.float64))
+        for (bucket, lender), total in zip(*np.unique(np.stack([start_buckets, lenders], axis=1), axis=0, return_counts=True)):
+            self.organization_counts[(int(bucket), int(lender))] += int(total)
+        self._add_occupancy(starts, ends)
+
+    def _add_occupancy(self, starts, ends):
+        """
+        Spread each booked window over the buckets it covers: partial seconds
+        on its first and last bucket, whole buckets in between through a
+        difference array.
+        """
+        import numpy as np
+        width = self.bucket_seconds
+        first = starts // width
+        last = (ends - 1) // width
+        origin = int(first.min())
+        size = int(last.max()) - origin + 2
+        occupied = np.zeros(size, dtype=np.float64)
+        same = first == last
+        np.add.at(occupied, first[same] - origin, (ends - starts)[same].astype(np.float64))
+        spans = ~same
+        if spans.any():
+            f, l = first[spans], last[spans]
+            np.add.at(occupied, f - origin, ((f + 1) * width - starts[spans]).astype(np.float64))
+            np.add.at(occupied, l - origin, (ends[spans] - l * width).astype(np.float64))
+            # Whole buckets strictly between first and last
+            full = np.zeros(size, dtype=np.float64)
+            np.add.at(full, f + 1 - origin, 1)
+            np.add.at(full, l - origin, -1)
+            occupied += np.cumsum(full) * width
+        for offset in np.nonzero(occupied)[0].tolist():
+            self.occupied_seconds[origin + offset] += float(occupied[offset])
+
+    def summary(self, time_from: int, time_to: int, locker_count: int) -> dict:
+        """
+        Aggregate the buckets overlapping [time_from, time_to).
+        """
+        import numpy as np
+        width = self.bucket_seconds
+        first, last = time_from // width, (time_to - 1) // width
+
+        def in_window(store):
+            return {bucket: value for bucket, value in store.items() if first <= bucket <= last}
+
+        logs = in_window(self.log_counts)
+        hours = np.zeros(HOURS_PER_DAY)
+        if logs:
+            buckets = np.fromiter(logs.keys(), dtype=np.int64, count=len(logs))
+            counts = np.fromiter(logs.values(), dtype=np.float64, count=len(logs))
+            hours = np.bincount((buckets * width // 3600) % HOURS_PER_DAY, weights=counts, minlength=HOURS_PER_DAY)
+
+        transactions = sum(in_window(self.transaction_counts).values())
+        durations = sum(in_window(self.duration_sums).values())
+        occupied = sum(in_window(self.occupied_seconds).values())
+        capacity = locker_count * (last - first + 1) * width
+        organizations = defaultdict(int)
+        for (bucket, lender), count in self.organization_counts.items():
+            if first <= bucket <= last:
+                organizations[lender] += int(count)
+
+        return {
+            "time_from": first * width,
+            "time_to": (last + 1) * width,
+            "lockers": locker_count,
+            "utilization": occupied / capacity if capacity else 0.0,
+            "transactions": int(transactions),
+            "mean_borrow_duration_s": durations / transactions if transactions else None,
+            "logs": int(hours.sum()),
+            "logs_by_hour_utc": [int(count) for count in hours],
+            "peak_hour_utc": int(hours.argmax()) if hours.any() else None,
+            "transactions_by_organization": dict(sorted(organizations.items(), key=lambda item: -item[1])),
+        }
+
+usage_analytics = UsageAnalytics()
+
+async def usage_summary(db: AsyncSession, time_from: int, time_to: int) -> dict:
+    if time_to <= time_from:
+        raise ValueError("time_to must be after time_from")
+    await usage_analytics.refresh(db)
+    return usage_analytics.summary(time_from, time_to, await crud.count_lockers(db))
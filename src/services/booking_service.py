@@ -0,0 +1,256 @@
+# services/booking_service.py
+import asyncio
+import logging
+import random
+import time
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+import crud, events, schemas
+
+logger = logging.getLogger(__name__)
+
+RESERVED = 0  # booked for a future window
+ONGOING = 1
+HOLDING_STATES = (RESERVED, ONGOING)
+OCCUPIED_LOCKER = 1
+BROKEN_LOCKER = 2
+
+class BookingConflictError(Exception):
+    pass
+
+class _Node:
+    __slots__ = ("key", "end", "locker_id", "priority", "left", "right", "max_end")
+
+    def __init__(self, start: int, end: int, transaction_id: int, locker_id: int):
+        self.key = (start, transaction_id)
+        self.end = end
+        self.locker_id = locker_id
+        self.priority = random.random()
+        self.left = self.right = None
+        self.max_end = end
+
+def _update(node: _Node) -> _Node:
+    node.max_end = node.end
+    if node.left is not None and node.left.max_end > node.max_end:
+        node.max_end = node.left.max_end
+    if node.right is not None and node.right.max_end > node.max_end:
+        node.max_end = node.right.max_end
+    return node
+
+def _split(node: Optional[_Node], key) -> tuple:
+    """Split into (keys < key, keys >= key)."""
+    if node is None:
+        return None, None
+    if node.key < key:
+        node.right, right = _split(node.right, key)
+        return _update(node), right
+    left, node.left = _split(node.left, key)
+    return left, _update(node)
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+class IntervalTree:
+    """
+    Every booking across all lockers in a treap keyed by (start, transaction_id),
+    each node also holding the largest end in its subtree. Insert and remove
+    are O(log n) expected; overlapping() reports the k bookings that overlap a
+    window in O(log n + k), pruning subtrees whose max end is before the window.
+    """
+
+    def __init__(self):
+        self._root = None
+
+    def clear(self):
+        self._root = None
+
+    def insert(self, start: int, end: int, transaction_id: int, locker_id: int):
+        left, right = _split(self._root, (start, transaction_id))
+        self._root = _merge(_merge(left, _Node(start, end, transaction_id, locker_id)), right)
+
+    def remove(self, start: int, transaction_id: int):
+        left, rest = _split(self._root, (start, transaction_id))
+        _, right = _split(rest, (start, transaction_id + 1))
+        self._root = _merge(left, right)
+
+    def overlapping(self, start: int, end: int) -> list:
+        """Locker ids of the bookings overlapping [start, end)."""
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            if node is None or node.max_end <= start:
+                continue
+            stack.append(node.left)
+            if node.key[0] < end:
+                if node.end > start:
+                    found.append(node.locker_id)
+                # Keys to the right start even later; only useful while before `end`
+                stack.append(node.right)
+        return found
+
+class BookingIndex:
+    """
+    Interval index of locker bookings.
+
+    Each locker keeps its bookings as a sorted list. They never overlap, so
+    sorted by start they are also sorted by end, and "is [start, end) free" is
+    one bisect plus a neighbour check: O(log n). All bookings also live in one
+    IntervalTree, so "lowest locker free over [start, end)" collects the k
+    lockers busy over the window in O(log n + k); the answer is then among the
+    first k + 1 bookable lockers. Bookings follow crud transaction events (a
+    booking is a transaction in HOLDING_STATES with a locker_id) and the index
+    is rebuilt from the database on startup. Windows are half-open, so
+    back-to-back bookings do not conflict.
+
+    Lockers handed out directly by the locker allocator (state OCCUPIED, no
+    booking) are tracked too: they count as busy for any window that contains
+    the current time.
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._starts = defaultdict(list)  # locker_id -> sorted start dates
+        self._bookings = defaultdict(list)  # locker_id -> (start, end, transaction_id), same order
+        self._by_transaction = {}  # transaction_id -> (locker_id, start)
+        self._tree = IntervalTree()
+        self._lockers = []  # sorted ids of lockers that can be booked
+        self._occupied = set()  # ids of lockers in use right now
+        self._locks = defaultdict(asyncio.Lock)
+        events.subscribe(events.TRANSACTION_STATE, self._on_transaction_state)
+        events.subscribe(events.LOCKER_STATE, self._on_locker_state)
+
+    async def rebuild(self, db: AsyncSession):
+        self._starts.clear()
+        self._bookings.clear()
+        self._by_transaction.clear()
+        self._tree.clear()
+        states = await crud.get_locker_states(db)
+        self._lockers = sorted(locker_id for locker_id, state in states if state != BROKEN_LOCKER)
+        self._occupied = {locker_id for locker_id, state in states if state == OCCUPIED_LOCKER}
+        for transaction_id, locker_id, start, end in await crud.get_bookings(db, HOLDING_STATES, int(self._clock())):
+            self._add_checked(locker_id, start, end, transaction_id)
+
+    def _on_locker_state(self, payload: dict):
+        locker_id = payload["locker_id"]
+        if payload["state"] == OCCUPIED_LOCKER:
+            self._occupied.add(locker_id)
+        else:
+            self._occupied.discard(locker_id)
+        i = bisect_left(self._lockers, locker_id)
+        known = i < len(self._lockers) and self._lockers[i] == locker_id
+        if payload["state"] == BROKEN_LOCKER:
+            if known:
+                del self._lockers[i]
+        elif not known:
+            self._lockers.insert(i, locker_id)
+
+    def _on_transaction_state(self, payload: dict):
+        transaction_id = payload["transaction_id"]
+        if payload["state"] in HOLDING_STATES and payload["locker_id"] is not None:
+            if (transaction_id not in self._by_transaction
+                    and payload["start_date"] is not None and payload["end_date"] is not None):
+                self._add_checked(payload["locker_id"], payload["start_date"], payload["end_date"], transaction_id)
+        else:
+            self._remove(transaction_id)
+
+    def _add_checked(self, locker_id: int, start: int, end: int, transaction_id: int):
+        """
+        Add a booking unless it overlaps one already indexed. Bookings made through
+        create_transaction_checked never do, but state changes and rows written
+        before the index existed can; indexing them would break the sorted,
+        non-overlapping order is_free relies on.
+        """
+        if not self._is_unbooked(locker_id, start, end):
+            logger.warning("Not indexing transaction %s: locker %s is already booked within [%s, %s)",
+                           transaction_id, locker_id, start, end)
+            return
+        self._add(locker_id, start, end, transaction_id)
+
+    def _add(self, locker_id: int, start: int, end: int, transaction_id: int):
+        i = bisect_right(self._starts[locker_id], start)
+        self._starts[locker_id].insert(i, start)
+        self._bookings[locker_id].insert(i, (start, end, transaction_id))
+        self._by_transaction[transaction_id] = (locker_id, start)
+        self._tree.insert(start, end, transaction_id, locker_id)
+
+    def _remove(self, transaction_id: int):
+        entry = self._by_transaction.pop(transaction_id, None)
+        if entry is None:
+            return
+        locker_id, start = entry
+        starts, bookings = self._starts[locker_id], self._bookings[locker_id]
+        i = bisect_left(starts, start)
+        while bookings[i][2] != transaction_id:
+            i += 1
+        del starts[i]
+        del bookings[i]
+        self._tree.remove(start, transaction_id)
+
+    def _covers_now(self, start: int, end: int) -> bool:
+        return start <= self._clock() < end
+
+    def is_free(self, locker_id: int, start: int, end: int) -> bool:
+        if locker_id in self._occupied and self._covers_now(start, end):
+            return False
+        return self._is_unbooked(locker_id, start, end)
+
+    def _is_unbooked(self, locker_id: int, start: int, end: int) -> bool:
+        starts = self._starts.get(locker_id)
+        if not starts:
+            return True
+        # Bookings before i start before `end`; only the last of them can reach past `start`
+        i = bisect_left(starts, end)
+        return i == 0 or self._bookings[locker_id][i - 1][1] <= start
+
+    def find_free_locker(self, start: int, end: int) -> Optional[int]:
+        """
+        Return the lowest locker id free over [start, end), or None.
+        """
+        busy = set(self._tree.overlapping(start, end))
+        if self._covers_now(start, end):
+            busy |= self._occupied
+        # At most len(busy) lockers are skipped before a free one turns up
+        for locker_id in self._lockers:
+            if locker_id not in busy:
+                return locker_id
+        return None
+
+    def lock(self, locker_id: int) -> asyncio.Lock:
+        """
+        Per-locker lock that makes check-then-create atomic within this process.
+        """
+        return self._locks[locker_id]
+
+booking_index = BookingIndex()
+
+def check_window(start: int, end: int):
+    if start is None or end is None or end <= start:
+        raise ValueError("end_date must be after start_date")
+
+async def create_transaction_checked(db: AsyncSession, transaction: schemas.TransactionCreate):
+    """
+    Create a transaction, refusing one whose locker is already booked over
+    [start_date, end_date). Raises BookingConflictError or ValueError.
+    """
+    if transaction.locker_id is None or transaction.state not in HOLDING_STATES:
+        return await crud.create_transaction(db, transaction)
+    check_window(transaction.start_date, transaction.end_date)
+    async with booking_index.lock(transaction.locker_id):
+        if not booking_index.is_free(transaction.locker_id, transaction.start_date, transaction.end_date):
+            raise BookingConflictError(
+                f"Locker {transaction.locker_id} is already booked between "
+                f"{transaction.start_date} and {transaction.end_date}"
+            )
+        # The crud transaction event adds the booking to the index before the lock is released
+        return await crud.create_transaction(db, transaction)
@@ -0,0 +1,110 @@
+# services/event_hub.py
+import asyncio
+from typing import Optional
+import config, events
+from responses import dumps
+
+STREAM_TOPICS = (
+    events.LOCKER_STATE,
+    events.TRANSACTION_STATE,
+    events.LOG_CREATED,
+    events.LOG_BATCH_CREATED,
+)
+
+class Subscriber:
+    """
+    One connected client: its filters and a bounded queue of encoded messages.
+    When a slow client falls behind, the oldest messages are dropped.
+    """
+
+    def __init__(self, topics: Optional[set], locker_id: Optional[int], transaction_id: Optional[int], queue_size: int):
+        self.topics = topics
+        self.locker_id = locker_id
+        self.transaction_id = transaction_id
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.dropped = 0
+
+    def matches(self, topic: str, payload: dict) -> bool:
+        if self.topics is not None and topic not in self.topics:
+            return False
+        if self.locker_id is not None and payload.get("locker_id") != self.locker_id:
+            return False
+        if self.transaction_id is not None:
+            if topic == events.LOG_BATCH_CREATED:
+                return self.transaction_id in payload["transaction_ids"]
+            return payload.get("transaction_id") == self.transaction_id
+        return True
+
+    def offer(self, message: str):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+class EventHub:
+    """
+    Fans crud events out to stream subscribers.
+
+    Subscribers are indexed by their locker or transaction filter, so an event
+    only visits the unfiltered subscribers and those watching its own
+    locker/transaction. Each event is JSON-encoded once for all recipients.
+    """
+
+    def __init__(self, queue_size: int = config.EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._unfiltered = set()
+        self._by_locker = {}
+        self._by_transaction = {}
+        for topic in STREAM_TOPICS:
+            events.subscribe(topic, lambda payload, topic=topic: self.publish(topic, payload))
+
+    def _bucket(self, subscriber: Subscriber) -> set:
+        if subscriber.locker_id is not None:
+            return self._by_locker.setdefault(subscriber.locker_id, set())
+        if subscriber.transaction_id is not None:
+            return self._by_transaction.setdefault(subscriber.transaction_id, set())
+        return self._unfiltered
+
+    def subscribe(self, topics: Optional[set] = None, locker_id: Optional[int] = None, transaction_id: Optional[int] = None) -> Subscriber:
+        subscriber = Subscriber(topics, locker_id, transaction_id, self.queue_size)
+        self._bucket(subscriber).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        bucket = self._bucket(subscriber)
+        bucket.discard(subscriber)
+        if bucket:
+            return
+        if subscriber.locker_id is not None:
+            self._by_locker.pop(subscriber.locker_id, None)
+        elif subscriber.transaction_id is not None:
+            self._by_transaction.pop(subscriber.transaction_id, None)
+
+    @property
+    def subscriber_count(self) -> int:
+        return (len(self._unfiltered)
+                + sum(len(bucket) for bucket in self._by_locker.values())
+                + sum(len(bucket) for bucket in self._by_transaction.values()))
+
+    def _candidates(self, topic: str, payload: dict):
+        yield from self._unfiltered
+        locker_id = payload.get("locker_id")
+        if locker_id is not None:
+            yield from self._by_locker.get(locker_id, ())
+        if topic == events.LOG_BATCH_CREATED:
+            for transaction_id in payload["transaction_ids"]:
+                yield from self._by_transaction.get(transaction_id, ())
+        else:
+            transaction_id = payload.get("transaction_id")
+            if transaction_id is not None:
+                yield from self._by_transaction.get(transaction_id, ())
+
+    def publish(self, topic: str, payload: dict):
+        message = None
+        for subscriber in list(self._candidates(topic, payload)):
+            if subscriber.matches(topic, payload):
+                if message is None:
+                    message = dumps({"topic": topic, "data": payload})
+                subscriber.offer(message)
+
+event_hub = EventHub()
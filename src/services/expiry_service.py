@@ -0,0 +1,114 @@
+# services/expiry_service.py
+import asyncio
+import heapq
+import logging
+import time
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+import config, crud, events
+from database import AsyncSessionLocal
+from services.locker_allocator import FREE, OCCUPIED
+
+logger = logging.getLogger(__name__)
+
+ONGOING = 1
+EXPIRED = 3
+
+class ExpiryScheduler:
+    """
+    Expires ongoing transactions once their end_date (epoch seconds) passes
+    and frees their lockers.
+
+    Deadlines sit in a min-heap that is loaded once from the (state, end_date)
+    index and then kept current from crud transaction events, so the table is
+    never polled: the task sleeps until the earliest deadline or until an
+    earlier one is added. Due transactions are expired in batches with one
+    conditional UPDATE, which also skips heap entries that went stale
+    (transaction closed or rescheduled meanwhile), and their lockers are freed
+    in the same database transaction. A batch that fails is rolled back, put
+    back on the heap and retried after RETRY_SECONDS.
+    """
+    RETRY_SECONDS = 5
+
+    def __init__(self, batch_size: int, clock=time.time):
+        self.batch_size = batch_size
+        self._clock = clock
+        self._heap = []  # (end_date, transaction_id)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._retry_at = 0.0
+
+    def _on_transaction_state(self, payload: dict):
+        if payload["state"] != ONGOING or payload["end_date"] is None:
+            return
+        entry = (payload["end_date"], payload["transaction_id"])
+        heapq.heappush(self._heap, entry)
+        if self._wakeup is not None and self._heap[0] == entry:
+            self._wakeup.set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._heap)
+
+    async def load(self, db: AsyncSession):
+        self._heap = await crud.get_transaction_deadlines(db, ONGOING)
+        heapq.heapify(self._heap)
+
+    async def start(self):
+        if self._task is None:
+            # Only track deadlines while running; nothing pops them otherwise
+            events.subscribe(events.TRANSACTION_STATE, self._on_transaction_state)
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        events.unsubscribe(events.TRANSACTION_STATE, self._on_transaction_state)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._wakeup = None
+
+    async def _run(self):
+        while True:
+            now = self._clock()
+            delay = max(self._heap[0][0], self._retry_at) - now if self._heap else None
+            if delay is None or delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self.expire_due()
+
+    async def expire_due(self) -> int:
+        """
+        Expire up to one batch of due transactions. Return how many expired.
+        """
+        now = int(self._clock())
+        entries = []
+        while self._heap and self._heap[0][0] <= now and len(entries) < self.batch_size:
+            entries.append(heapq.heappop(self._heap))
+        if not entries:
+            return 0
+        due = [transaction_id for _, transaction_id in entries]
+        try:
+            async with AsyncSessionLocal() as db:
+                expired, _ = await crud.expire_transactions(
+                    db, due, EXPIRED, expected_state=ONGOING, end_date_before=now,
+                    locker_state=FREE, locker_expected_state=OCCUPIED,
+                )
+        except Exception:
+            logger.exception("Failed to expire %d transactions, retrying in %ds", len(due), self.RETRY_SECONDS)
+            for entry in entries:
+                heapq.heappush(self._heap, entry)
+            self._retry_at = self._clock() + self.RETRY_SECONDS
+            return 0
+        return len(expired)
+
+expiry_scheduler = ExpiryScheduler(config.EXPIRY_BATCH_SIZE)
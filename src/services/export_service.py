@@ -0,0 +1,89 @@
+# services/export_service.py
+import csv
+from io import BytesIO, StringIO
+from typing import Optional
+from sqlalchemy import select
+import config, models
+from database import AsyncSessionLocal
+from responses import dumps
+
+LOG_COLUMNS = [column.key for column in models.Log.__table__.columns]
+
+# format -> media type
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+def _log_query(time_from: Optional[int], time_to: Optional[int]):
+    query = select(*models.Log.__table__.columns)
+    if time_from is not None:
+        query = query.filter(models.Log.time >= time_from)
+    if time_to is not None:
+        query = query.filter(models.Log.time < time_to)
+    return query.order_by(models.Log.time, models.Log.id)
+
+async def _log_chunks(time_from: Optional[int], time_to: Optional[int], chunk_size: int):
+    """
+    Yield lists of log row tuples, `chunk_size` at a time, from a streaming
+    (server-side where the driver supports it) cursor. The session is opened
+    here rather than taken from a request dependency, because the response
+    body is produced after the handler has returned.
+    """
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(_log_query(time_from, time_to).execution_options(yield_per=chunk_size))
+        async for partition in result.partitions(chunk_size):
+            yield partition
+
+async def _csv(chunks):
+    buf = StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(LOG_COLUMNS)
+    async for rows in chunks:
+        writer.writerows(rows)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+async def _ndjson(chunks):
+    async for rows in chunks:
+        yield "".join(dumps(dict(zip(LOG_COLUMNS, row))) + "\n" for row in rows)
+
+async def _arrow(chunks):
+    import pyarrow as pa
+    schema = pa.schema([(name, pa.int64()) for name in LOG_COLUMNS])
+    sink = BytesIO()
+    writer = pa.ipc.new_stream(sink, schema)
+
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+
+    yield drain()  # stream schema
+    async for rows in chunks:
+        columns = list(zip(*rows))
+        writer.write_batch(pa.record_batch([pa.array(column, pa.int64()) for column in columns], schema=schema))
+        yield drain()
+    writer.close()
+    yield drain()
+
+def export_logs(fmt: str, time_from: Optional[int] = None, time_to: Optional[int] = None,
+                chunk_size: int = config.EXPORT_CHUNK_SIZE):
+    """
+    Return an async iterator over the encoded export of logs in
+    [time_from, time_to), ordered by time. Memory use is bounded by one chunk.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}', expected one of {', '.join(EXPORT_FORMATS)}")
+    if fmt == "arrow":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("The arrow export format requires pyarrow")
+    encoder = {"csv": _csv, "ndjson": _ndjson, "arrow": _arrow}[fmt]
+    return encoder(_log_chunks(time_from, time_to, chunk_size))
@@ -0,0 +1,62 @@
+# services/locker_allocator.py
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+import crud, events
+
+FREE = 0
+OCCUPIED = 1
+
+class LockerAllocator:
+    """
+    Hands out free lockers without scanning the lockers table.
+
+    Free locker ids live in an insertion-ordered dict used as a set, so taking
+    one (popitem) and adding/removing one are O(1). The set follows every
+    crud locker state change through `events`, and is rebuilt from the
+    database on startup.
+
+    The in-memory set is only a hint: a claim is confirmed with a
+    free -> occupied compare-and-set in the database, so a locker taken by
+    another worker is skipped instead of being handed out twice.
+    """
+
+    def __init__(self):
+        self._free = {}
+        events.subscribe(events.LOCKER_STATE, self._on_locker_state)
+
+    def _on_locker_state(self, payload: dict):
+        if payload["state"] == FREE:
+            self._free[payload["locker_id"]] = None
+        else:
+            self._free.pop(payload["locker_id"], None)
+
+    async def rebuild(self, db: AsyncSession):
+        """
+        Reload the free set from the database.
+        """
+        self._free = dict.fromkeys(await crud.get_locker_ids_by_state(db, FREE))
+
+    @property
+    def free_count(self) -> int:
+        return len(self._free)
+
+    async def claim(self, db: AsyncSession) -> Optional[int]:
+        """
+        Mark any free locker as occupied and return its id, or None if
+        no locker is free.
+        """
+        while self._free:
+            # popitem runs before the first await, so no other task can take the same id
+            locker_id, _ = self._free.popitem()
+            if await crud.update_locker_state(db, locker_id, OCCUPIED, expected_state=FREE):
+                return locker_id
+            # Stale entry: the locker was taken elsewhere, try the next one
+        return None
+
+    async def release(self, db: AsyncSession, locker_ids: list[int]) -> list[int]:
+        """
+        Free many occupied lockers with one UPDATE and return the ids that were released.
+        """
+        return await crud.update_lockers_state(db, locker_ids, FREE, expected_state=OCCUPIED)
+
+locker_allocator = LockerAllocator()
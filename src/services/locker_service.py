@@ -1,27 +1,39 @@
 # services/locker_service.py
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 import crud
+from services.locker_allocator import locker_allocator
 
-def open_locker(db: Session, locker_id: int) -> bool:
+async def open_locker(db: AsyncSession, locker_id: int) -> bool:
     """
     Attempt to 'open' a locker if it’s in a valid state.
     Return True if successful, False otherwise.
     """
-    locker = crud.get_locker(db, locker_id)
+    locker = await crud.get_locker(db, locker_id)
     if locker and locker.state != 2:  # e.g. state=2 might be 'broken'
         # "Open" the locker in your real system
         # Possibly set state to 'occupied' or just do nothing if physically opened
         return True
     return False
 
-def assign_item_to_locker(db: Session, transaction_id: int):
+async def assign_item_to_locker(db: AsyncSession, transaction_id: int):
     """
     Mark the locker as occupied for the given transaction, if possible.
     """
-    trans = crud.get_transaction(db, transaction_id)
+    trans = await crud.get_transaction(db, transaction_id)
     if trans and trans.locker_id:
-        locker = crud.get_locker(db, trans.locker_id)
-        if locker and locker.state == 0:  # 0=free
-            crud.update_locker_state(db, locker.id, 1)  # 1=occupied
-            return True
+        # Check-and-claim in one conditional UPDATE, so two requests can't both win
+        locker = await crud.update_locker_state(db, trans.locker_id, 1, expected_state=0)  # 0=free -> 1=occupied
+        return locker is not None
     return False
+
+async def allocate_locker(db: AsyncSession):
+    """
+    Occupy any free locker and return its id, or None if all are taken.
+    """
+    return await locker_allocator.claim(db)
+
+async def release_lockers(db: AsyncSession, locker_ids: list[int]):
+    """
+    Free the given lockers and return the ids that were actually released.
+    """
+    return await locker_allocator.release(db, locker_ids)
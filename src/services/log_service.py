@@ -1,12 +1,98 @@
-from sqlalchemy.orm import Session
-import crud, schemas
+import asyncio
+import logging
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+import config, crud, models, schemas
+from database import AsyncSessionLocal
 
-def send_log(db: Session, action: int, person: int, time: int, transaction_id: int):
-    # Basic log creation
+logger = logging.getLogger(__name__)
+
+class LogBuffer:
+    """
+    Write-behind buffer for logs.
+
+    Logs are queued in memory and a background task writes them with
+    crud.create_logs, one transaction per batch, as soon as `batch_size` logs
+    are waiting or `flush_interval` seconds after the first one arrived.
+    `put` waits while the queue is full, so producers slow down instead of
+    memory growing without bound. `stop` writes everything still queued.
+    """
+    _STOP = object()
+
+    def __init__(self, max_size: int, batch_size: int, flush_interval: float):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    async def start(self):
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Flush every queued log and stop the background task.
+        """
+        if self._task is None:
+            return
+        await self._queue.put(self._STOP)
+        await self._task
+        self._task = None
+        self._queue = None
+
+    async def put(self, log_in: schemas.LogCreate):
+        await self._queue.put(log_in)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is self._STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list):
+        try:
+            async with AsyncSessionLocal() as db:
+                await crud.create_logs(db, batch)
+        except Exception:
+            logger.exception("Dropped %d buffered logs", len(batch))
+
+log_buffer = LogBuffer(config.LOG_BUFFER_MAX_SIZE, config.LOG_BUFFER_BATCH_SIZE, config.LOG_BUFFER_FLUSH_SECONDS)
+
+async def send_log(db: AsyncSession, action: int, person: int, time: int, transaction_id: int) -> Optional[models.Log]:
+    """
+    Record a log. Returns the stored row, or None in buffered mode, where the
+    row (and its id) only exists once the buffer has flushed it.
+    """
     log_data = schemas.LogCreate(
         action=action,
         person=person,
         time=time,
         transaction_id=transaction_id
     )
-    return crud.create_log(db, log_data)
+    if log_buffer.running:
+        await log_buffer.put(log_data)
+        return None
+    return await crud.create_log(db, log_data)
@@ -1,37 +1,210 @@
-import qrcode
+import asyncio
+import json
+from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
+from typing import Optional
+import config
+from cache import TTLCache
+
+QR_VERSION = 1
+BOX_SIZE = 10
+BORDER = 4
+
+FORMATS = ("png", "svg", "matrix")
+
+# Encoded output keyed by (format, canonical payload)
+qr_cache = TTLCache(config.QR_CACHE_MAX_ENTRIES, config.QR_CACHE_TTL_SECONDS)
+_pool = None
+_decode_pool = None
+# Per-process decoder state, loaded once by _init_decoder
+_decoder = None
+
+def _payload(data: dict) -> str:
+    # Canonical form, so equal dicts share a cache entry (and a smaller code)
+    return json.dumps(data, sort_keys=True, separators=(",", ":"))
+
+def _build(payload: str):
+    # Imported on first use: qrcode pulls in PIL, which slows down startup
+    import qrcode
+    qr = qrcode.QRCode(version=QR_VERSION, box_size=BOX_SIZE, border=BORDER)
+    qr.add_data(payload)
+    qr.make(fit=True)
+    return qr
+
+def _matrix(payload: str) -> list:
+    return _build(payload).get_matrix()  # includes the border
+
+def _svg(matrix: list) -> bytes:
+    """
+    Render a module matrix as SVG without PIL: one path, one rectangle per
+    horizontal run of dark modules.
+    """
+    size = len(matrix) * BOX_SIZE
+    runs = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < len(row):
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < len(row) and row[x]:
+                x += 1
+            runs.append(f"M{start * BOX_SIZE} {y * BOX_SIZE}h{(x - start) * BOX_SIZE}v{BOX_SIZE}h-{(x - start) * BOX_SIZE}z")
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" viewBox="0 0 {size} {size}">'
+        f'<rect width="100%" height="100%" fill="white"/><path fill="black" d="{"".join(runs)}"/></svg>'
+    ).encode()
+
+def _render(payload: str, fmt: str):
+    """
+    Encode one payload. Top-level so it can run in the process pool.
+    """
+    if fmt == "matrix":
+        return tuple(tuple(row) for row in _matrix(payload))
+    if fmt == "svg":
+        return _svg(_matrix(payload))
+    img = _build(payload).make_image(fill_color="black", back_color="white")
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+def _check_format(fmt: str):
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown QR format '{fmt}', expected one of {FORMATS}")
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=config.QR_POOL_WORKERS)
+    return _pool
+
+def _get_decode_pool() -> ProcessPoolExecutor:
+    global _decode_pool
+    if _decode_pool is None:
+        _decode_pool = ProcessPoolExecutor(max_workers=config.QR_DECODE_WORKERS, initializer=_init_decoder)
+    return _decode_pool
+
+def shutdown_qr_pool():
+    global _pool, _decode_pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+    if _decode_pool is not None:
+        _decode_pool.shutdown()
+        _decode_pool = None
+
+def render_qr(data: dict, fmt: str = "png"):
+    """
+    Encode `data` as "png" or "svg" bytes, or as a "matrix" of rows of booleans
+    (True = dark module, border included). Results are cached per payload.
+    """
+    _check_format(fmt)
+    key = (fmt, _payload(data))
+    rendered = qr_cache.get(key)
+    if rendered is None:
+        rendered = _render(key[1], fmt)
+        qr_cache.set(key, rendered)
+    return rendered
+
+def render_qr_batch(items: list, fmt: str = "png") -> list:
+    """
+    Encode many payloads, in the same order as `items`. Cached payloads are
+    reused; batches with at least QR_POOL_MIN_BATCH misses are rendered
+    across the process pool, smaller ones in-process.
+    """
+    _check_format(fmt)
+    keys = [(fmt, _payload(data)) for data in items]
+    results = [qr_cache.get(key) for key in keys]
+    missing = list({key[1]: None for key, rendered in zip(keys, results) if rendered is None})
+    if len(missing) >= config.QR_POOL_MIN_BATCH:
+        chunksize = max(1, len(missing) // (config.QR_POOL_WORKERS * 4))
+        rendered = list(_get_pool().map(_render, missing, [fmt] * len(missing), chunksize=chunksize))
+    else:
+        rendered = [_render(payload, fmt) for payload in missing]
+    fresh = dict(zip(missing, rendered))
+    for payload, output in fresh.items():
+        qr_cache.set((fmt, payload), output)
+    return [fresh[key[1]] if result is None else result for key, result in zip(keys, results)]
 
 def generate_qr_code(data: dict) -> BytesIO:
     """
     Generate a QR code (PNG) from data dictionary.
     Return an in-memory BytesIO object containing the PNG.
     """
-    qr = qrcode.QRCode(version=1, box_size=10, border=4)
-    # Convert dict to a simple string; you might use JSON
-    import json
-    qr.add_data(json.dumps(data))
-    qr.make(fit=True)
+    return BytesIO(render_qr(data, "png"))
 
-    img = qr.make_image(fill_color="black", back_color="white")
+def _init_decoder():
+    """
+    Load the decoders once per process. OpenCV is preferred, pyzbar is the
+    fallback; either may be missing.
+    """
+    global _decoder
+    _decoder = {}
+    try:
+        import cv2
+        import numpy
+        _decoder["numpy"] = numpy
+        _decoder["detector"] = cv2.QRCodeDetector()
+    except ImportError:
+        pass
+    try:
+        from pyzbar.pyzbar import decode
+        _decoder["pyzbar"] = decode
+    except ImportError:
+        pass
 
-    buf = BytesIO()
-    img.save(buf, format="PNG")
-    buf.seek(0)
-    return buf
+def _decode_text(image_bytes: bytes) -> Optional[str]:
+    """
+    Decode the first QR code in an image and return its text, or None.
+    The image is converted to grayscale and downscaled before decoding.
+    """
+    from PIL import Image
+    if _decoder is None:
+        _init_decoder()
+    img = Image.open(BytesIO(image_bytes)).convert("L")
+    img.thumbnail((config.QR_DECODE_MAX_SIDE, config.QR_DECODE_MAX_SIDE))
+    detector = _decoder.get("detector")
+    if detector is not None:
+        text, _, _ = detector.detectAndDecode(_decoder["numpy"].asarray(img))
+        if text:
+            return text
+    pyzbar_decode = _decoder.get("pyzbar")
+    if pyzbar_decode is not None:
+        result = pyzbar_decode(img)
+        if result:
+            return result[0].data.decode("utf-8")
+    return None
+
+def _decode_text_or_none(image_bytes: bytes) -> Optional[str]:
+    """
+    Pool entry point for batches: an upload that is not a readable image
+    yields None instead of failing every other image in the batch.
+    """
+    from PIL import Image
+    try:
+        return _decode_text(image_bytes)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return None
+
+def _parse(text: Optional[str]) -> dict:
+    if text is None:
+        return {}
+    return json.loads(text)
 
 def decode_qr_code(image_bytes: bytes) -> dict:
     """
     Decode a QR code from raw image bytes.
     Return a dictionary of the data that was encoded.
-    This requires a library like `pyzbar` or similar.
     """
-    from PIL import Image
-    from pyzbar.pyzbar import decode
-    img = Image.open(BytesIO(image_bytes))
-    result = decode(img)
-    if not result:
-        return {}
-    # Assume one code
-    import json
-    data_str = result[0].data.decode("utf-8")
-    return json.loads(data_str)
+    return _parse(_decode_text(image_bytes))
+
+async def decode_qr_batch(images: list) -> list:
+    """
+    Decode many images on the decode process pool without blocking the event
+    loop. Return, per image, the decoded text (None if no code was found or
+    the upload is not a readable image).
+    """
+    loop = asyncio.get_running_loop()
+    pool = _get_decode_pool()
+    return list(await asyncio.gather(*(loop.run_in_executor(pool, _decode_text_or_none, image) for image in images)))